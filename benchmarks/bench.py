@@ -0,0 +1,226 @@
+# benchmarks/bench.py
+# Times the pipeline's stage functions on synthetic inputs (synthetic.py) and checks them
+# against stored baselines:
+#
+#   python benchmarks/bench.py --scale leagues              # print timings and peak memory
+#   python benchmarks/bench.py --scale leagues --save       # (re)write benchmarks/baselines/leagues.json
+#   python benchmarks/bench.py --scale leagues --check      # exit 1 if a stage got slower than the baseline
+#
+# Every stage runs in a scratch working directory (the scripts write under ./data), gets fresh
+# copies of its inputs and starts from an empty data/.cache, so incremental stages do their full
+# work. Time is the best of BENCH_REPEATS runs; peak memory comes from a separate tracemalloc
+# pass, since tracing slows the code it measures. A stage counts as slower when it exceeds its
+# baseline by more than BENCH_THRESHOLD (relative) and BENCH_MIN_DELTA seconds (absolute, so
+# millisecond stages do not fail on noise). Baselines only compare on the machine that wrote them.
+
+import os, io, sys, json, time, shutil, argparse, platform, tempfile, warnings, tracemalloc, contextlib
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "scripts"))
+
+import synthetic
+import fetch_football_data, fetch_the_odds_api, fetch_fbr_team_xg, enrich_features, build_hist_and_upcoming
+import remove_margin, team_ratings, team_form, score_model, validate_data, schema
+from team_names import NameResolver
+
+BASELINE_DIR = os.path.join(HERE, "baselines")
+REPEATS = int(os.environ.get("BENCH_REPEATS", "3"))
+THRESHOLD = float(os.environ.get("BENCH_THRESHOLD", "0.25"))
+MIN_DELTA = float(os.environ.get("BENCH_MIN_DELTA", "0.005"))
+
+class Bench:
+    """`setup(ctx)` builds the arguments (untimed, before every run); `fn(*args)` is timed."""
+    def __init__(self, name, setup, fn):
+        self.name, self.setup, self.fn = name, setup, fn
+
+# ---------- inputs ----------
+def prepare(data):
+    """Context the stage benches draw their inputs from: the synthetic tables as the pipeline
+    holds them after loading (schema types, canonical team names) plus each stage's output."""
+    ctx = {k: schema.coerce(v.copy(), k) if isinstance(v, pd.DataFrame) else v for k, v in data.items()}
+    known = list(ctx["teams_master"]["team"]) + list(ctx["stadiums"]["team"])
+    ctx["resolver"] = lambda: NameResolver({}, known)
+    resolver = ctx["resolver"]()
+    for name in ("injuries", "lineups"):
+        ctx[name]["team"] = resolver.resolve(ctx[name]["team"], report=False)
+    hist = enrich_features.prepare_raw(ctx["raw_football_data"], resolver)
+    upc = enrich_features.prepare_raw(ctx["raw_theodds_fixtures"], resolver)
+    schema.share_teams(ctx["teams_master"], ctx["stadiums"], ctx["injuries"], ctx["lineups"],
+                       ctx["xg_metrics_hybrid"], hist, upc)
+    ctx["hist"], ctx["upc"] = hist, upc
+    with quiet():
+        enriched = enrich_all(ctx)
+        ctx["HIST_matches"], ctx["UPCOMING_fixtures"] = build_hist_and_upcoming.build(
+            enriched["enriched_football_data.csv"], enriched["enriched_theodds_fixtures.csv"])
+        for n in ("HIST_matches", "UPCOMING_fixtures"):
+            ctx[n] = remove_margin.add_fair_probs(ctx[n])
+        ctx["HIST_matches"], ctx["UPCOMING_fixtures"] = team_ratings.add_ratings(ctx["HIST_matches"], ctx["UPCOMING_fixtures"])
+        ctx["HIST_matches"], ctx["UPCOMING_fixtures"] = team_form.add_form(ctx["HIST_matches"], ctx["UPCOMING_fixtures"])
+    ctx["prices"] = fetch_the_odds_api.flatten_odds(ctx["odds_api"])
+    return ctx
+
+def enrich_all(ctx):
+    raws = {"raw_football_data.csv": ctx["raw_football_data"], "raw_theodds_fixtures.csv": ctx["raw_theodds_fixtures"]}
+    return enrich_features.enrich_all(raws, ctx["teams_master"], ctx["stadiums"], ctx["ref_baselines"],
+                                      ctx["injuries"], ctx["lineups"], ctx["xg_metrics_hybrid"], {})
+
+def copies(*names):
+    return lambda ctx: tuple(ctx[n].copy() if isinstance(ctx[n], pd.DataFrame) else ctx[n] for n in names)
+
+def _upcoming_fixtures(ctx):
+    return ctx["UPCOMING_fixtures"].copy(), ctx["xg_metrics_hybrid"], score_model.goal_rates(ctx["HIST_matches"])
+
+def _model_hist(ctx):
+    return ctx["HIST_matches"].copy(), ctx["xg_metrics_hybrid"], score_model.goal_rates(ctx["HIST_matches"])
+
+# In pipeline order: parsers, enrichment modules, whole enrichment, then the HIST/UPCOMING stages.
+BENCHES = [
+    Bench("parse_football_data", copies("football_data_csv"), fetch_football_data.normalize),
+    Bench("flatten_odds", copies("odds_api"), fetch_the_odds_api.flatten_odds),
+    Bench("consensus_odds", copies("prices"), fetch_the_odds_api.consensus),
+    Bench("fbr_xg_blend", copies("xg_long"), fetch_fbr_team_xg.blend),
+    Bench("resolve_team_names", lambda ctx: (ctx["resolver"](), ctx["raw_football_data"]["home_team"].copy()),
+          lambda r, s: r.resolve(s, report=False)),
+    Bench("merge_team_master", copies("hist", "teams_master"), enrich_features.merge_team_master),
+    Bench("apply_injuries", copies("hist", "injuries"), enrich_features.apply_injuries),
+    Bench("apply_lineup_flags", copies("hist", "lineups"), enrich_features.apply_lineup_flags),
+    Bench("compute_travel", copies("hist", "stadiums"), enrich_features.compute_travel),
+    Bench("merge_xg_hybrid", copies("hist", "xg_metrics_hybrid"), enrich_features.merge_xg_hybrid),
+    Bench("apply_ref_rates", copies("hist", "ref_baselines"), enrich_features.apply_ref_rates),
+    Bench("apply_calendar", lambda ctx: (ctx["hist"].copy(), enrich_features.build_calendar([ctx["hist"], ctx["upc"]])),
+          enrich_features.apply_calendar),
+    Bench("enrich_frame", copies("hist", "teams_master", "stadiums", "ref_baselines", "injuries", "lineups",
+                                 "xg_metrics_hybrid"), enrich_features.enrich_frame),
+    Bench("enrich_all", lambda ctx: (ctx,), enrich_all),
+    Bench("build_hist_and_upcoming", lambda ctx: (ctx["HIST_matches"].copy(), ctx["UPCOMING_fixtures"].copy()),
+          build_hist_and_upcoming.build),
+    Bench("remove_margin", copies("HIST_matches"), remove_margin.add_fair_probs),
+    Bench("team_ratings", copies("HIST_matches", "UPCOMING_fixtures"), team_ratings.add_ratings),
+    Bench("team_form", copies("HIST_matches", "UPCOMING_fixtures"), team_form.add_form),
+    Bench("score_model", _model_hist, score_model.add_model_probs),
+    Bench("score_model_upcoming", _upcoming_fixtures, score_model.add_model_probs),
+    Bench("validate_hist", copies("HIST_matches"), lambda df: validate_data.check_table("HIST_matches.csv", df)),
+]
+
+# ---------- measuring ----------
+@contextlib.contextmanager
+def quiet():
+    """Stage output and pandas deprecation warnings would drown the results."""
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        yield
+
+def fresh_cache():
+    shutil.rmtree(os.path.join("data", ".cache"), ignore_errors=True)
+
+def measure(bench, ctx, repeats=REPEATS, memory=True):
+    """{"seconds": best, "median": median, "peak_mb": tracemalloc peak or None}."""
+    times = []
+    for _ in range(repeats):
+        fresh_cache()
+        args = bench.setup(ctx)
+        with quiet():
+            t0 = time.perf_counter()
+            bench.fn(*args)
+            times.append(time.perf_counter() - t0)
+    out = {"seconds": round(min(times), 6), "median": round(float(np.median(times)), 6), "peak_mb": None}
+    if memory:
+        fresh_cache()
+        args = bench.setup(ctx)
+        tracemalloc.start()
+        try:
+            with quiet(): bench.fn(*args)
+            out["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        finally:
+            tracemalloc.stop()
+    return out
+
+def run(scale, seed=0, only=None, repeats=REPEATS, memory=True):
+    t0 = time.perf_counter()
+    data = synthetic.generate(*synthetic.SCALES[scale], seed=seed)
+    print(f"[INFO] {scale}: {len(data['raw_football_data'])} matches, {len(data['raw_theodds_fixtures'])} fixtures "
+          f"(generated in {time.perf_counter() - t0:.1f}s)")
+    cwd, work = os.getcwd(), tempfile.mkdtemp(prefix="bench-")
+    try:
+        os.chdir(work)
+        os.makedirs("data")
+        ctx = prepare(data)
+        stages = {}
+        for bench in BENCHES:
+            if only and bench.name not in only: continue
+            stages[bench.name] = r = measure(bench, ctx, repeats, memory)
+            mem = f"{r['peak_mb']:>9.1f} MB" if r["peak_mb"] is not None else ""
+            print(f"  {bench.name:<24} {r['seconds']:>9.4f}s {mem}")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work, ignore_errors=True)
+    return {"scale": scale, "seed": seed, "matches": len(data["raw_football_data"]),
+            "fixtures": len(data["raw_theodds_fixtures"]), "repeats": repeats,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "machine": {"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+                        "platform": platform.platform(), "processor": platform.machine()},
+            "stages": stages}
+
+# ---------- baselines ----------
+def baseline_path(scale):
+    return os.path.join(BASELINE_DIR, f"{scale}.json")
+
+def save(result):
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    path = baseline_path(result["scale"])
+    with open(path, "w") as f: json.dump(result, f, indent=1)
+    print(f"[OK] baseline -> {path}")
+
+def compare(result, baseline, threshold=THRESHOLD, min_delta=MIN_DELTA):
+    """Names of the stages slower than their baseline; prints one line per stage."""
+    slower = []
+    for name, r in result["stages"].items():
+        b = baseline["stages"].get(name)
+        if b is None:
+            print(f"[INFO] {name}: no baseline"); continue
+        ratio = r["seconds"] / b["seconds"] if b["seconds"] else float("inf")
+        mem = ""
+        if r["peak_mb"] is not None and b.get("peak_mb"):
+            mem = f", peak {r['peak_mb']:.1f} MB vs {b['peak_mb']:.1f} MB"
+        line = f"{name}: {r['seconds']:.4f}s vs {b['seconds']:.4f}s ({ratio:.2f}x{mem})"
+        if ratio > 1 + threshold and r["seconds"] - b["seconds"] > min_delta:
+            slower.append(name)
+            print(f"[FAIL] {line}")
+        else:
+            print(f"[OK] {line}")
+    return slower
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the pipeline stages on synthetic data.")
+    ap.add_argument("--scale", choices=synthetic.SCALES, default="season")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--only", help="comma-separated bench names")
+    ap.add_argument("--repeats", type=int, default=REPEATS)
+    ap.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    ap.add_argument("--save", action="store_true", help="write the results as the scale's baseline")
+    ap.add_argument("--check", action="store_true", help="exit 1 when a stage is slower than its baseline")
+    ap.add_argument("--threshold", type=float, default=THRESHOLD, help="allowed relative slowdown (0.25 = 25%%)")
+    ap.add_argument("--out", help="also write the results to this JSON file")
+    args = ap.parse_args()
+    only = [s.strip() for s in args.only.split(",")] if args.only else None
+    unknown = set(only or []) - {b.name for b in BENCHES}
+    if unknown: sys.exit(f"Unknown bench {', '.join(sorted(unknown))}; benches are: {', '.join(b.name for b in BENCHES)}")
+
+    result = run(args.scale, args.seed, only, max(1, args.repeats), not args.no_memory)
+    if args.out:
+        with open(args.out, "w") as f: json.dump(result, f, indent=1)
+    if args.check:
+        path = baseline_path(args.scale)
+        if not os.path.exists(path): sys.exit(f"No baseline {path}; run with --save first")
+        with open(path) as f: baseline = json.load(f)
+        if baseline.get("seed") != args.seed:
+            print(f"[WARN] baseline was generated with seed {baseline.get('seed')}, not {args.seed}")
+        slower = compare(result, baseline, args.threshold)
+        if slower:
+            sys.exit(f"{len(slower)} stage(s) slower than baseline by more than {args.threshold:.0%}: {', '.join(slower)}")
+    if args.save: save(result)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# benchmarks/synthetic.py
+# Seeded synthetic inputs for the pipeline, sized by leagues x seasons x rounds of a 20-team
+# double round robin (380 matches per league season):
+#
+#   matchday      1 league,   1 season,  1 round       10 matches
+#   season        1 league,   1 season,  38 rounds    380 matches
+#   leagues      20 leagues,  3 seasons               22,800 matches
+#   full         40 leagues, 15 seasons              228,000 matches
+#
+# generate() returns the frames the stages take (normalized results and fixtures, teams_master,
+# stadiums, ref_baselines, injuries, lineups, xG tables) plus the raw shapes the parsers take:
+# a football-data.co.uk CSV frame and an Odds API JSON payload for the upcoming round.
+#
+#   python benchmarks/synthetic.py --scale leagues --out /tmp/bench/data   # write CSVs
+
+import os, argparse
+import numpy as np
+import pandas as pd
+
+SCALES = {"matchday": (1, 1, 1), "season": (1, 1, 38), "leagues": (20, 3, 38), "full": (40, 15, 38)}
+TEAMS_PER_LEAGUE = 20
+BOOKMAKERS = 8
+REPO_DATA = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+LAST_SEASON = 2024  # the final generated season starts in August of this year
+
+def round_robin(n=TEAMS_PER_LEAGUE):
+    """(round, home, away) arrays of a double round robin by the circle method."""
+    rounds, home, away = [], [], []
+    ring = list(range(n))
+    for r in range(n - 1):
+        for i in range(n // 2):
+            h, a = ring[i], ring[n - 1 - i]
+            if (r + i) % 2: h, a = a, h
+            rounds += [r, r + n - 1]; home += [h, a]; away += [a, h]
+        ring = [ring[0]] + [ring[-1]] + ring[1:-1]
+    order = np.argsort(rounds, kind="stable")
+    return np.array(rounds)[order], np.array(home)[order], np.array(away)[order]
+
+def team_names(leagues):
+    return np.array([f"Club {l:02d}-{t:02d}" for l in range(leagues) for t in range(TEAMS_PER_LEAGUE)])
+
+def odds_from(p, rng, margin=0.05):
+    """Decimal odds for outcome probabilities `p` with a bookmaker margin and a little noise."""
+    q = p * (1 + margin) * rng.uniform(0.97, 1.03, p.shape)
+    return np.round(1.0 / q, 2)
+
+def results(leagues, seasons, rounds, rng):
+    """Played matches: one row per league x season x round x fixture, in date order per league."""
+    rnd, h, a = round_robin()
+    keep = rnd < rounds
+    rnd, h, a = rnd[keep], h[keep], a[keep]
+    n = len(rnd)
+    L, S = np.repeat(np.arange(leagues), seasons * n), np.tile(np.repeat(np.arange(seasons), n), leagues)
+    R = np.tile(rnd, leagues * seasons)
+    slot = np.tile(np.arange(n) % (TEAMS_PER_LEAGUE // 2), leagues * seasons)
+    # teams are shuffled per league season so fixtures differ from season to season
+    perm = np.argsort(rng.random((leagues * seasons, TEAMS_PER_LEAGUE)), axis=1)
+    ls = L * seasons + S
+    home = L * TEAMS_PER_LEAGUE + perm[ls, np.tile(h, leagues * seasons)]
+    away = L * TEAMS_PER_LEAGUE + perm[ls, np.tile(a, leagues * seasons)]
+    start = pd.to_datetime([f"{LAST_SEASON - seasons + 1 + s}-08-09" for s in range(seasons)])
+    date = start[S] + pd.to_timedelta(7 * R + slot % 3, unit="D")  # Saturday .. Monday
+    strength = rng.normal(0, 0.35, leagues * TEAMS_PER_LEAGUE)
+    lam_h, lam_a = np.exp(0.35 + strength[home] - strength[away]), np.exp(0.1 + strength[away] - strength[home])
+    return pd.DataFrame({"league": L, "date": date, "home": home, "away": away,
+                         "home_goals": rng.poisson(lam_h), "away_goals": rng.poisson(lam_a),
+                         "p_home": np.clip(0.74 * lam_h / (lam_h + lam_a), 0.1, 0.64)})
+
+def outcome_probs(p_home, p_draw=0.26):
+    return np.c_[p_home, np.full(len(p_home), p_draw), 1.0 - p_draw - p_home]
+
+def generate(leagues=1, seasons=1, rounds=38, seed=0):
+    """dict of frames (and the "odds_api" payload, a list of dicts), deterministic per seed."""
+    rng = np.random.default_rng(seed)
+    names = team_names(leagues)
+    n_teams = len(names)
+    played = results(leagues, seasons, rounds, rng)
+    odds = odds_from(outcome_probs(played["p_home"].to_numpy()), rng)
+    # raw feeds spell some clubs differently; the reference tables use the canonical names
+    variant = np.char.add(names, np.where(rng.random(n_teams) < 0.2, " FC", ""))
+    refs = np.array([f"Referee {i:03d}" for i in range(max(10, leagues * 3))])
+
+    hist = pd.DataFrame({"date": played["date"].dt.strftime("%Y-%m-%d"),
+                         "home_team": variant[played["home"]], "away_team": variant[played["away"]],
+                         "home_goals": played["home_goals"], "away_goals": played["away_goals"],
+                         "home_odds_dec": odds[:, 0], "draw_odds_dec": odds[:, 1], "away_odds_dec": odds[:, 2],
+                         "ref_name": rng.choice(refs, len(played))})
+    football_data = pd.DataFrame({
+        "Div": pd.array([f"L{l}" for l in played["league"]], dtype="string"),
+        "Date": pd.array(played["date"].dt.strftime("%d/%m/%Y"), dtype="string"),
+        "HomeTeam": pd.array(variant[played["home"]], dtype="string"),
+        "AwayTeam": pd.array(variant[played["away"]], dtype="string"),
+        "FTHG": pd.array(played["home_goals"], dtype="Int16"), "FTAG": pd.array(played["away_goals"], dtype="Int16"),
+        "B365H": odds[:, 0], "B365D": odds[:, 1], "B365A": odds[:, 2]})
+
+    # upcoming: the next round of every league, one week after its last played match
+    rnd, h, a = round_robin()
+    nxt = rnd == rounds % (2 * (TEAMS_PER_LEAGUE - 1))
+    L = np.repeat(np.arange(leagues), nxt.sum())
+    up_home = L * TEAMS_PER_LEAGUE + np.tile(h[nxt], leagues)
+    up_away = L * TEAMS_PER_LEAGUE + np.tile(a[nxt], leagues)
+    kickoff = played.groupby("league")["date"].max().to_numpy()[L] + pd.Timedelta(days=7, hours=15)
+    upcoming = pd.DataFrame({"date": pd.DatetimeIndex(kickoff).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                             "home_team": names[up_home], "away_team": names[up_away]})
+    up_p = outcome_probs(rng.uniform(0.3, 0.55, len(upcoming)))
+    up_odds = odds_from(up_p, rng)
+    upcoming[["home_odds_dec","draw_odds_dec","away_odds_dec"]] = up_odds
+    odds_api = [{"id": f"g{i:06d}", "sport_key": "soccer_synthetic", "commence_time": r.date,
+                 "home_team": r.home_team, "away_team": r.away_team,
+                 "bookmakers": [{"key": f"book{b}", "title": f"Book {b}", "last_update": r.date,
+                                 "markets": [{"key": "h2h", "outcomes": [
+                                     {"name": r.home_team, "price": float(o[0])}, {"name": "Draw", "price": float(o[1])},
+                                     {"name": r.away_team, "price": float(o[2])}]},
+                                     {"key": "totals", "outcomes": [
+                                         {"name": "Over", "price": float(t), "point": 2.5},
+                                         {"name": "Under", "price": float(round(t / (t - 1) - 0.1, 2)), "point": 2.5}]}]}
+                                for b, o, t in zip(range(BOOKMAKERS), odds_from(np.tile(up_p[i], (BOOKMAKERS, 1)), rng),
+                                                   rng.uniform(1.7, 2.2, BOOKMAKERS).round(2))]}
+                for i, r in enumerate(upcoming.itertuples())]
+
+    teams = pd.DataFrame({"team": names, "gk_rating": rng.uniform(0.55, 0.9, n_teams).round(3),
+                          "setpiece_rating": rng.uniform(0.5, 0.85, n_teams).round(3),
+                          "crowd_index": rng.uniform(0.5, 0.95, n_teams).round(3)})
+    stadiums = pd.DataFrame({"team": names, "stadium": np.char.add(names, " Park"),
+                             "lat": rng.uniform(36, 60, n_teams).round(4), "lon": rng.uniform(-8, 25, n_teams).round(4)})
+    ref_baselines = pd.DataFrame({"ref_name": refs, "ref_pen_rate": rng.uniform(0.15, 0.45, len(refs)).round(3)})
+
+    # injury / lineup reports: roughly one per team every other match, dated on match days
+    n_rep = max(1, len(played) // 2)
+    pick = rng.integers(0, len(played), n_rep)
+    side = np.where(rng.random(n_rep) < 0.5, played["home"].to_numpy()[pick], played["away"].to_numpy()[pick])
+    rep_dates = (played["date"].to_numpy()[pick] - rng.integers(0, 3, n_rep).astype("timedelta64[D]"))
+    rep_dates = pd.DatetimeIndex(rep_dates).strftime("%Y-%m-%d")
+    injuries = pd.DataFrame({"date": rep_dates, "team": variant[side], "injury_index": rng.uniform(0, 1, n_rep).round(3)})
+    lineups = pd.DataFrame({"date": rep_dates, "team": variant[side], "key_att_out": rng.integers(0, 2, n_rep),
+                            "key_def_out": rng.integers(0, 2, n_rep), "keeper_changed": rng.integers(0, 2, n_rep)})
+
+    # FBR standings, up to three seasons back, and the hybrid table built from them
+    ages = min(seasons, 3)
+    xg_long = pd.DataFrame({"league_id": np.tile(np.repeat(np.arange(leagues), TEAMS_PER_LEAGUE), ages),
+                            "season_id": np.repeat(LAST_SEASON - np.arange(ages), n_teams),
+                            "team": np.tile(names, ages), "mp": 38, "age": np.repeat(np.arange(ages), n_teams)})
+    xg_long["xg"] = rng.uniform(30, 85, len(xg_long)).round(1)
+    xg_long["xga"] = rng.uniform(30, 85, len(xg_long)).round(1)
+    xg_long["xgd"] = xg_long["xg"] - xg_long["xga"]
+    xg_long["xgd_per90"] = (xg_long["xgd"] / 38).round(2)
+    xg_long["season"] = xg_long["season_id"].astype(str)
+    current = xg_long[xg_long["age"] == 0].drop(columns="age")
+    hybrid = pd.DataFrame({"team": names, "league_id": np.repeat(np.arange(leagues), TEAMS_PER_LEAGUE),
+                           "xg_hybrid": (current["xg"].to_numpy() / 38).round(3),
+                           "xga_hybrid": (current["xga"].to_numpy() / 38).round(3)})
+    hybrid["xgd_hybrid"] = hybrid["xg_hybrid"] - hybrid["xga_hybrid"]
+    hybrid["xgd90_hybrid"] = hybrid["xgd_hybrid"]
+    hybrid["mp_weighted"], hybrid["n_seasons"] = 38.0 * ages, ages
+
+    return {"raw_football_data": hist, "raw_theodds_fixtures": upcoming, "football_data_csv": football_data,
+            "odds_api": odds_api, "teams_master": teams, "stadiums": stadiums, "ref_baselines": ref_baselines,
+            "injuries": injuries, "lineups": lineups, "xg_long": xg_long,
+            "xg_metrics_current": current.drop(columns="season_id"),
+            "xg_metrics_last": xg_long[xg_long["age"] == 1].drop(columns=["age","season_id"]),
+            "xg_metrics_hybrid": hybrid}
+
+def write(data, out):
+    """Write the CSV tables of generate() under `out` (a data/ directory)."""
+    os.makedirs(out, exist_ok=True)
+    for name, df in data.items():
+        if isinstance(df, pd.DataFrame) and name not in ("football_data_csv", "xg_long"):
+            df.to_csv(os.path.join(out, f"{name}.csv"), index=False)
+    pd.DataFrame(columns=["raw","canonical"]).to_csv(os.path.join(out, "team_name_map.csv"), index=False)
+    pd.DataFrame(columns=["date","home_team","away_team"]).to_csv(os.path.join(out, "odds_lines.csv"), index=False)
+
+def main():
+    ap = argparse.ArgumentParser(description="Write seeded synthetic pipeline inputs.")
+    ap.add_argument("--scale", choices=SCALES, default="season")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", required=True, help="directory to write the CSVs to")
+    ap.add_argument("--force", action="store_true", help="allow writing into the repository's data/")
+    args = ap.parse_args()
+    out = os.path.realpath(args.out)
+    if not args.force and os.path.commonpath([out, REPO_DATA]) == REPO_DATA:
+        ap.error(f"{args.out} is in the repository's data/ (curated inputs would be overwritten); "
+                 "pick another directory or pass --force")
+    data = generate(*SCALES[args.scale], seed=args.seed)
+    write(data, args.out)
+    print(f"[OK] {args.scale}: {len(data['raw_football_data'])} matches, "
+          f"{len(data['raw_theodds_fixtures'])} fixtures -> {args.out}")
+
+if __name__ == "__main__":
+    main()
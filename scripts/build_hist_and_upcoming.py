@@ -1,9 +1,36 @@
-import pandas as pd, os
+import pandas as pd, numpy as np, os, time
+import schema
+from utils import match_ids, csv_header
 
-HIST_IN="data/raw_football_data.csv"
-UPCOMING_IN="data/raw_theodds_fixtures.csv"
+HIST_IN="data/enriched_football_data.csv"
+UPCOMING_IN="data/enriched_theodds_fixtures.csv"
 HIST_OUT="data/HIST_matches.csv"
 UPCOMING_OUT="data/UPCOMING_fixtures.csv"
+# Per-build changes against the previous HIST / UPCOMING, keyed by match_id (overwritten each build;
+# a run that skips the build writes them header-only, so they always describe the current run):
+#   change = inserted | updated | moved_from_upcoming (HIST) | moved_to_hist | removed
+#   changed_cols = ";"-joined columns that differ (updated rows only), then the row itself
+DELTA_DIR="data/deltas"
+
+# Derived features appended after the fixed schema when the enriched input has them
+OPTIONAL_COLS=[# hybrid xG rates (merge_xg_hybrid); score_model.py turns them into scoreline probabilities
+               "home_xg","away_xg","home_xga","away_xga","home_xgd_per90","away_xgd_per90",
+               "home_matches_7d","away_matches_7d","home_matches_14d","away_matches_14d",
+               "home_matches_30d","away_matches_30d",
+               # bookmaker consensus (fetch_the_odds_api)
+               "home_odds_best","draw_odds_best","away_odds_best",
+               "home_implied_mean","draw_implied_mean","away_implied_mean",
+               "overround_mean","overround_min","n_bookmakers",
+               "totals_line","totals_over_odds","totals_under_odds",
+               "spreads_home_line","spreads_home_odds","spreads_away_odds",
+               # line movement from the odds history (close in HIST, latest in UPCOMING)
+               "home_odds_open","draw_odds_open","away_odds_open",
+               "home_odds_latest","draw_odds_latest","away_odds_latest",
+               "home_odds_close","draw_odds_close","away_odds_close",
+               "home_odds_move","draw_odds_move","away_odds_move"]
+
+def extras(df):
+    return [c for c in OPTIONAL_COLS if c in df.columns]
 
 def reorder_hist(df):
     cols=["date","home_team","away_team","home_goals","away_goals",
@@ -11,21 +38,89 @@ def reorder_hist(df):
           "home_rest_days","away_rest_days","home_travel_km","away_travel_km",
           "home_injury_index","away_injury_index","home_gk_rating","away_gk_rating",
           "home_setpiece_rating","away_setpiece_rating","ref_pen_rate","crowd_index"]
-    return df[cols]
+    return df[["match_id"]+cols+extras(df)]
 
 def reorder_upc(df):
     cols=["date","home_team","away_team","home_odds_dec","draw_odds_dec","away_odds_dec",
           "home_rest_days","away_rest_days","home_travel_km","away_travel_km",
           "home_injury_index","away_injury_index","home_gk_rating","away_gk_rating",
           "home_setpiece_rating","away_setpiece_rating","ref_pen_rate","crowd_index"]
-    return df[cols]
+    return df[["match_id"]+cols+extras(df)]
+
+def with_ids(df):
+    """match_id (hash of kick-off day + canonical teams) for frames that predate the column."""
+    if "match_id" not in df.columns:
+        df=df.assign(match_id=match_ids(df["date"],df["home_team"],df["away_team"]).to_numpy())
+    return df
+
+def build(hist, upc):
+    order=["date","home_team","away_team"]  # stable, so unchanged files diff cleanly
+    return (reorder_hist(with_ids(hist)).sort_values(order,kind="stable",ignore_index=True),
+            reorder_upc(with_ids(upc)).sort_values(order,kind="stable",ignore_index=True))
+
+# ---------- deltas ----------
+def _col_hashes(df, cols):
+    """(rows, cols) uint64 hashes; numbers as float64 and categories by value, so dtypes do not matter."""
+    out=np.empty((len(df),len(cols)),dtype=np.uint64)
+    for i,c in enumerate(cols):
+        s=df[c]
+        if pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s): s=s.astype("float64")
+        elif isinstance(s.dtype,pd.CategoricalDtype): s=s.astype(object)
+        out[:,i]=pd.util.hash_pandas_object(s,index=False).to_numpy()
+    return out
+
+def diff(new, old, moved_ids=()):
+    """Delta rows of `new` against `old` (both with match_id). `moved_ids` relabels inserts."""
+    new=new.drop_duplicates("match_id",keep="last").set_index("match_id")
+    old=with_ids(old).drop_duplicates("match_id",keep="last").set_index("match_id").reindex(columns=new.columns)
+    common=new.index.intersection(old.index)
+    neq=_col_hashes(new.loc[common],new.columns)!=_col_hashes(old.loc[common],new.columns)
+    upd=neq.any(axis=1)
+    names=np.array(new.columns,dtype=object)
+    ins=new.index.difference(old.index)
+    parts=[new.loc[ins].assign(change=np.where(ins.isin(list(moved_ids)),"moved_from_upcoming","inserted"),changed_cols=""),
+           new.loc[common[upd]].assign(change="updated",changed_cols=[";".join(names[m]) for m in neq[upd]]),
+           old.loc[old.index.difference(new.index)].assign(change="removed",changed_cols="")]
+    out=pd.concat([p for p in parts if len(p)]) if any(len(p) for p in parts) else pd.DataFrame(columns=new.columns)
+    return out.reindex(columns=["change","changed_cols"]+list(new.columns)).rename_axis("match_id").reset_index()
+
+def write_deltas(hist, upc, old_hist=None, old_upc=None):
+    """Diff the new HIST / UPCOMING against the files on disk and write DELTA_DIR/<name>.csv."""
+    old_hist=schema.read(HIST_OUT) if old_hist is None else old_hist
+    old_upc=schema.read(UPCOMING_OUT) if old_upc is None else old_upc
+    if old_hist.empty: old_hist=pd.DataFrame(columns=hist.columns)
+    if old_upc.empty: old_upc=pd.DataFrame(columns=upc.columns)
+    old_upc_ids=with_ids(old_upc)["match_id"]
+    d_hist=diff(hist,old_hist,moved_ids=old_upc_ids)
+    d_upc=diff(upc,old_upc)
+    moved=d_upc["match_id"].isin(d_hist.loc[d_hist["change"]=="moved_from_upcoming","match_id"])
+    d_upc.loc[moved.to_numpy(),"change"]="moved_to_hist"
+    _save_deltas(d_hist,d_upc)
+    return d_hist,d_upc
+
+def write_empty_deltas():
+    """Header-only deltas stamped now, for runs that skip the build: the previous build's
+    changes must not be picked up again as this run's."""
+    empty=[pd.DataFrame(columns=["match_id","change","changed_cols"]+[c for c in csv_header(p) if c!="match_id"])
+           if os.path.exists(p) else pd.DataFrame(columns=["match_id","change","changed_cols"])
+           for p in (HIST_OUT,UPCOMING_OUT)]
+    _save_deltas(*empty)
+
+def _save_deltas(d_hist,d_upc):
+    os.makedirs(DELTA_DIR,exist_ok=True)
+    stamp=time.strftime("%Y-%m-%dT%H:%M:%SZ",time.gmtime())
+    for name,d in (("HIST_matches",d_hist),("UPCOMING_fixtures",d_upc)):
+        d.insert(0,"built_at",stamp)
+        d.to_csv(os.path.join(DELTA_DIR,f"{name}.csv"),index=False)
+        summary=", ".join(f"{n} {k}" for k,n in d["change"].value_counts().items()) or "no changes"
+        print(f"[OK] delta {name}: {summary}")
 
 def main():
-    hist=pd.read_csv(HIST_IN,parse_dates=["date"])
-    upc=pd.read_csv(UPCOMING_IN,parse_dates=["date"])
-    hist=reorder_hist(hist).sort_values("date")
-    upc=reorder_upc(upc).sort_values("date")
+    hist=schema.read(HIST_IN)
+    upc=schema.read(UPCOMING_IN)
+    hist,upc=build(hist,upc)
     os.makedirs("data",exist_ok=True)
+    write_deltas(hist,upc)
     hist.to_csv(HIST_OUT,index=False)
     upc.to_csv(UPCOMING_OUT,index=False)
     print("Built:",HIST_OUT,len(hist),"|",UPCOMING_OUT,len(upc))
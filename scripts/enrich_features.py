@@ -1,21 +1,43 @@
 # scripts/enrich_features.py
-import os, math
+import os, json
+import numpy as np
 import pandas as pd
+from utils import frame_hash, match_ids, row_hashes
+from team_names import NameResolver, load_name_map, NAME_MAP_PATH
+import schema
 
 DATA_DIR = "data"
 
+# raw input -> enriched output; raw files are never rewritten, so re-running is idempotent
+OUTPUTS = {
+    "raw_football_data.csv": "enriched_football_data.csv",
+    "raw_theodds_fixtures.csv": "enriched_theodds_fixtures.csv",
+}
+STATE_PATH = os.path.join(DATA_DIR, ".cache", "enrich_state.json")
+DIST_CACHE = os.path.join(DATA_DIR, ".cache", "stadium_dist.npz")
+CONGESTION_WINDOWS = (7, 14, 30)  # days; -> {side}_matches_{w}d
+# Which logged price (odds_history) each output compares with the opening line
+LINE_STAT = {"enriched_football_data.csv": "close", "enriched_theodds_fixtures.csv": "latest"}
+# How old (in days) an injury / lineup report may be and still apply to a fixture
+STALENESS_DAYS = {
+    "injuries": int(os.environ.get("INJURY_STALENESS_DAYS", "7")),
+    "lineups": int(os.environ.get("LINEUP_STALENESS_DAYS", "3")),
+}
+ENRICH_FULL = os.environ.get("ENRICH_FULL", "0").strip() == "1"  # force a full re-enrichment
+ENRICH_VERSION = 3  # bump when the enrichment logic changes so stored rows are rebuilt
+
 # ---------- helpers ----------
 def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; works on scalars and on whole NumPy columns."""
     R = 6371.0
-    import math as m
-    phi1, phi2 = m.radians(lat1), m.radians(lat2)
-    dphi = m.radians(lat2 - lat1)
-    dlambda = m.radians(lon2 - lon1)
-    a = m.sin(dphi/2)**2 + m.cos(phi1)*m.cos(phi2)*m.sin(dlambda/2)**2
-    return 2*R*m.asin(m.sqrt(a))
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = np.radians(np.asarray(lon2) - np.asarray(lon1))
+    a = np.sin(dphi/2)**2 + np.cos(phi1)*np.cos(phi2)*np.sin(dlambda/2)**2
+    return 2*R*np.arcsin(np.sqrt(a))
 
 def safe_read(path):
-    return pd.read_csv(path) if os.path.exists(path) else pd.DataFrame()
+    return schema.read(path)
 
 def ensure_cols(df, defaults: dict):
     for col, default in defaults.items():
@@ -33,31 +55,103 @@ def coalesce(df, base_name, fill=0.0):
         if c in df.columns: df.drop(columns=[c], inplace=True)
     return df
 
-# ---------- name normalizer ----------
-def load_name_map(path):
-    if not os.path.exists(path): return {}
-    m = pd.read_csv(path).dropna(subset=["raw","canonical"])
-    return {str(r.raw).strip(): str(r.canonical).strip() for _, r in m.iterrows()}
+# ---------- team feature index ----------
+class TeamIndex:
+    """Teams encoded once as integer codes, with per-team attributes stored column-wise.
+
+    Every attribute array has one trailing NaN slot; unknown teams are coded to it, so
+    home/away features are plain `take` lookups instead of DataFrame merges.
+    """
+    def __init__(self, *tables):
+        names = set()
+        for t in tables:
+            if t is not None and not t.empty and "team" in t.columns:
+                names.update(t["team"].dropna().unique().astype(str))
+        self.names = pd.Index(sorted(names))
+        self.missing = len(self.names)
+        self.attrs, self.dated = {}, {}
+
+    def codes(self, teams):
+        c = schema.team_codes(self.names, teams)
+        c[c < 0] = self.missing
+        return c
+
+    def encode(self, df):
+        return {side: self.codes(df[f"{side}_team"]) for side in ("home","away")}
+
+    def add(self, name, table, cols):
+        """Store static numeric columns of a team-keyed table (last row per team wins)."""
+        t = table.drop_duplicates("team", keep="last")
+        pos = self.codes(t["team"])
+        self.attrs[name] = {}
+        for c in cols:
+            arr = np.full(self.missing + 1, np.nan)
+            if c in t.columns: arr[pos] = pd.to_numeric(t[c], errors="coerce").to_numpy(float)
+            arr[self.missing] = np.nan  # rows with a blank team landed in the unknown slot
+            self.attrs[name][c] = arr
+        return self
+
+    def add_dated(self, name, table, cols):
+        """Store a (date, team)-keyed table as one sorted int64 key per row: code<<32 | day."""
+        t = table.assign(_day=day_numbers(table["date"])).dropna(subset=["_day"])
+        key = (self.codes(t["team"]).astype(np.int64) << 32) | t["_day"].to_numpy(np.int64)
+        order = np.argsort(key, kind="stable")
+        key, vals = key[order], {c: pd.to_numeric(t[c], errors="coerce").to_numpy(float)[order] for c in cols}
+        last = np.r_[key[1:] != key[:-1], True]  # duplicate (team, day) rows: keep the last one
+        self.dated[name] = (key[last], {c: v[last] for c, v in vals.items()})
+        return self
 
-def apply_name_map(series, name_map):
-    return series.apply(lambda x: name_map.get(str(x).strip(), str(x).strip()) if pd.notna(x) else x)
+    def take(self, name, col, codes):
+        return self.attrs[name][col].take(codes)
+
+    def take_asof(self, name, col, codes, days, max_age=0):
+        """Point-in-time lookup: the team's latest record dated on or before `days`,
+        if it is at most `max_age` days old. Records after the fixture are never used.
+        One binary search over the sorted (team, day) keys; no cross join."""
+        keys, vals = self.dated[name]
+        out = np.full(len(codes), np.nan)
+        if not len(keys): return out
+        ok = ~np.isnan(days) & (codes != self.missing)
+        q = (codes[ok].astype(np.int64) << 32) | days[ok].astype(np.int64)
+        pos = np.searchsorted(keys, q, side="right") - 1
+        k = keys[np.maximum(pos, 0)]
+        fresh = (pos >= 0) & ((k >> 32) == (q >> 32)) & (q - k <= max_age)
+        out[ok] = np.where(fresh, vals[col][np.maximum(pos, 0)], np.nan)
+        return out
+
+def day_numbers(dates):
+    """Days since epoch as float (NaN for unparseable dates)."""
+    d = schema.to_dates(dates)
+    return (d.dt.floor("D") - pd.Timestamp(0)).dt.days.to_numpy(float)
+
+def fill_from(df, col, values, default):
+    """Looked-up values win; otherwise keep what the row already had, then the default."""
+    cur = pd.to_numeric(df[col], errors="coerce") if col in df.columns else pd.Series(np.nan, index=df.index)
+    df[col] = pd.Series(values, index=df.index).where(lambda v: v.notna(), cur).fillna(default)
+    return df
+
+def _index_for(df, idx, codes, build):
+    idx = idx if idx is not None else build()
+    return idx, codes if codes is not None else idx.encode(df)
 
 # ---------- modules ----------
-def merge_team_master(df, teams):
+def merge_team_master(df, teams, idx=None, codes=None):
     if teams.empty:
         return ensure_cols(df, {
             "home_gk_rating": 0.6, "away_gk_rating": 0.6,
             "home_setpiece_rating": 0.6, "away_setpiece_rating": 0.6,
             "crowd_index": 0.7
         })
-    df = df.merge(teams.add_prefix("home_"), left_on="home_team", right_on="home_team", how="left")
-    df = df.merge(teams.add_prefix("away_"), left_on="away_team", right_on="away_team", how="left")
-    if "crowd_index" not in df.columns or df["crowd_index"].isna().all():
-        df["crowd_index"] = df.get("home_crowd_index", 0.7).fillna(0.7)
+    extra = [c for c in teams.columns if c != "team"]
+    idx, codes = _index_for(df, idx, codes, lambda: TeamIndex(teams))
+    if "teams_master" not in idx.attrs: idx.add("teams_master", teams, extra)
     for side in ("home","away"):
-        df = ensure_cols(df, {f"{side}_gk_rating": None, f"{side}_setpiece_rating": None})
-        df = coalesce(df, f"{side}_gk_rating", 0.6)
-        df = coalesce(df, f"{side}_setpiece_rating", 0.6)
+        for c in extra:
+            vals = idx.take("teams_master", c, codes[side])
+            if c in ("gk_rating","setpiece_rating"): fill_from(df, f"{side}_{c}", vals, 0.6)
+            else: df[f"{side}_{c}"] = vals
+    if "crowd_index" not in df.columns or df["crowd_index"].isna().all():
+        df["crowd_index"] = df.get("home_crowd_index", 0.7)
     df["crowd_index"] = df["crowd_index"].fillna(0.7)
     return df
 
@@ -70,93 +164,152 @@ def apply_ref_rates(df, refs):
         df["ref_pen_rate"] = df["ref_pen_rate"].fillna(0.30)
     return df
 
-def apply_injuries(df, inj):
+def apply_injuries(df, inj, idx=None, codes=None):
     if inj.empty:
         return ensure_cols(df, {"home_injury_index": 0.3, "away_injury_index": 0.3})
-    inj["date"] = pd.to_datetime(inj["date"], errors="coerce")
-    if "date" in df.columns: df["date"] = pd.to_datetime(df["date"], errors="coerce")
-    df = ensure_cols(df, {"home_injury_index": None, "away_injury_index": None})
-    df = df.merge(inj.rename(columns={"team":"home_team","injury_index":"home_injury_index"}),
-                  on=["date","home_team"], how="left")
-    df = df.merge(inj.rename(columns={"team":"away_team","injury_index":"away_injury_index"}),
-                  on=["date","away_team"], how="left")
-    df = coalesce(df, "home_injury_index", 0.3)
-    df = coalesce(df, "away_injury_index", 0.3)
+    idx, codes = _index_for(df, idx, codes, lambda: TeamIndex(inj))
+    if "injuries" not in idx.dated: idx.add_dated("injuries", inj, ["injury_index"])
+    days = day_numbers(df["date"])
+    for side in ("home","away"):
+        fill_from(df, f"{side}_injury_index",
+                  idx.take_asof("injuries", "injury_index", codes[side], days, STALENESS_DAYS["injuries"]), 0.3)
     return df
 
-def apply_lineup_flags(df, lu):
+def apply_lineup_flags(df, lu, idx=None, codes=None):
+    flags = ("key_att_out","key_def_out","keeper_changed")
     if lu.empty:
-        return ensure_cols(df, {"home_key_att_out":0,"home_key_def_out":0,"home_keeper_changed":0,
-                                "away_key_att_out":0,"away_key_def_out":0,"away_keeper_changed":0})
-    lu["date"] = pd.to_datetime(lu["date"], errors="coerce")
-    if "date" in df.columns: df["date"] = pd.to_datetime(df["date"], errors="coerce")
+        return ensure_cols(df, {f"{side}_{f}": 0 for side in ("home","away") for f in flags})
+    idx, codes = _index_for(df, idx, codes, lambda: TeamIndex(lu))
+    if "lineups" not in idx.dated: idx.add_dated("lineups", lu, list(flags))
+    days = day_numbers(df["date"])
     for side in ("home","away"):
-        m = lu.rename(columns={
-            "team":f"{side}_team",
-            "key_att_out":f"{side}_key_att_out",
-            "key_def_out":f"{side}_key_def_out",
-            "keeper_changed":f"{side}_keeper_changed"
-        })
-        df = df.merge(m, on=["date",f"{side}_team"], how="left")
-        for flag in (f"{side}_key_att_out", f"{side}_key_def_out", f"{side}_keeper_changed"):
-            df[flag] = df.get(flag, 0).fillna(0).astype(int)
+        for f in flags:
+            fill_from(df, f"{side}_{f}", idx.take_asof("lineups", f, codes[side], days, STALENESS_DAYS["lineups"]), 0)
+            df[f"{side}_{f}"] = df[f"{side}_{f}"].astype(schema.FLAG)
     return df
 
-def compute_travel(df, stad):
+def stadium_distances(stad):
+    """Team x team distance matrix (km) over stadiums.csv, cached on disk by content hash.
+
+    Returns (teams, lat, lon, dist); each array has a trailing NaN slot for unknown teams.
+    """
+    s = stad.dropna(subset=["team","lat","lon"]).drop_duplicates("team", keep="last")
+    key = frame_hash(s[["team","lat","lon"]].astype(str))
+    if os.path.exists(DIST_CACHE):
+        with np.load(DIST_CACHE, allow_pickle=False) as z:
+            if str(z["key"]) == key:
+                return pd.Index(z["teams"]), z["lat"], z["lon"], z["dist"]
+    lat = np.r_[pd.to_numeric(s["lat"], errors="coerce").to_numpy(float), np.nan]
+    lon = np.r_[pd.to_numeric(s["lon"], errors="coerce").to_numpy(float), np.nan]
+    dist = haversine(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+    teams = s["team"].astype(str).to_numpy(dtype=str)
+    os.makedirs(os.path.dirname(DIST_CACHE), exist_ok=True)
+    np.savez(DIST_CACHE, key=key, teams=teams, lat=lat, lon=lon, dist=dist)
+    return pd.Index(teams), lat, lon, dist
+
+def venue_coords(venues, stad):
+    """lat/lon of a neutral venue given as a stadium name or a team name (NaN if unknown)."""
+    s = stad.dropna(subset=["lat","lon"])
+    lookup = pd.concat([s.set_index(s["stadium"].astype(str).str.strip())[["lat","lon"]] if "stadium" in s else None,
+                        s.set_index(s["team"].astype(str).str.strip())[["lat","lon"]]])
+    lookup = lookup[~lookup.index.duplicated(keep="first")].apply(pd.to_numeric, errors="coerce")
+    v = lookup.reindex(venues.astype("string").str.strip())
+    return v["lat"].to_numpy(float), v["lon"].to_numpy(float)
+
+def compute_travel(df, stad, idx=None, codes=None):
     df = ensure_cols(df, {"home_travel_km": None, "away_travel_km": None})
     if stad.empty:
         df["home_travel_km"] = df["home_travel_km"].fillna(0.0)
         df["away_travel_km"] = df["away_travel_km"].fillna(200.0)
         return df
-    sH = stad.add_prefix("home_"); sA = stad.add_prefix("away_")
-    df = df.merge(sH, how="left", left_on="home_team", right_on="home_team")
-    df = df.merge(sA, how="left", left_on="away_team", right_on="away_team")
-    def row_dist(r):
-        if pd.isna(r.get("home_lat")) or pd.isna(r.get("away_lat")): return 200.0
-        return haversine(r["home_lat"], r["home_lon"], r["away_lat"], r["away_lon"])
-    df["home_travel_km"] = df["home_travel_km"].fillna(0.0)
-    mask = df["away_travel_km"].isna()
-    if mask.any(): df.loc[mask, "away_travel_km"] = df[mask].apply(row_dist, axis=1)
+    idx, codes = _index_for(df, idx, codes, lambda: TeamIndex(stad))
+    teams, lat, lon, dist = stadium_distances(stad)
+    # team-index codes -> distance-matrix codes (unknown teams hit the trailing NaN slot)
+    remap = teams.get_indexer(idx.names)
+    remap = np.r_[np.where(remap < 0, len(teams), remap), len(teams)]
+    h, a = remap.take(codes["home"]), remap.take(codes["away"])
+    df["home_lat"], df["home_lon"], df["away_lat"], df["away_lon"] = lat[h], lon[h], lat[a], lon[a]
+    home_km = np.where(np.isnan(dist[h, a]), np.nan, 0.0)
+    away_km = dist[h, a]
+
+    # neutral venues (e.g. finals): both sides travel from their own stadium to the venue
+    if "venue" in df.columns and df["venue"].notna().any():
+        vlat, vlon = venue_coords(df["venue"], stad)
+        neutral = df["venue"].notna().to_numpy() & ~np.isnan(vlat)
+        home_km = np.where(neutral, haversine(lat[h], lon[h], vlat, vlon), home_km)
+        away_km = np.where(neutral, haversine(lat[a], lon[a], vlat, vlon), away_km)
+    fill_from(df, "home_travel_km", home_km, 0.0)
+    fill_from(df, "away_travel_km", away_km, 200.0)
     return df
 
-def merge_xg_hybrid(df, xgdf):
+def merge_xg_hybrid(df, xgdf, idx=None, codes=None):
     if xgdf is None or xgdf.empty: return df
-    # Home
-    hxg = xgdf.rename(columns={
-        "team":"home_team",
-        "xg_hybrid":"home_xg",
-        "xga_hybrid":"home_xga",
-        "xgd_hybrid":"home_xgd",
-        "xgd90_hybrid":"home_xgd_per90"
-    })
-    df = df.merge(hxg[["home_team","home_xg","home_xga","home_xgd","home_xgd_per90"]], on="home_team", how="left")
-    # Away
-    axg = xgdf.rename(columns={
-        "team":"away_team",
-        "xg_hybrid":"away_xg",
-        "xga_hybrid":"away_xga",
-        "xgd_hybrid":"away_xgd",
-        "xgd90_hybrid":"away_xgd_per90"
-    })
-    df = df.merge(axg[["away_team","away_xg","away_xga","away_xgd","away_xgd_per90"]], on="away_team", how="left")
-    # ensure columns exist
-    for c in ["home_xg","home_xga","home_xgd","home_xgd_per90","away_xg","away_xga","away_xgd","away_xgd_per90"]:
-        if c not in df.columns: df[c] = None
+    cols = {"xg_hybrid":"xg", "xga_hybrid":"xga", "xgd_hybrid":"xgd", "xgd90_hybrid":"xgd_per90"}
+    idx, codes = _index_for(df, idx, codes, lambda: TeamIndex(xgdf))
+    if "xg_hybrid" not in idx.attrs: idx.add("xg_hybrid", xgdf, list(cols))
+    for side in ("home","away"):
+        for src, dst in cols.items():
+            df[f"{side}_{dst}"] = idx.take("xg_hybrid", src, codes[side])
     return df
 
 def normalize_dates(df):
-    if "date" in df.columns: df["date"] = pd.to_datetime(df["date"], errors="coerce").dt.tz_localize(None)
+    if "date" in df.columns: df["date"] = schema.to_dates(df["date"])
     return df
 
-def enrich_file(path, teams, stad, refs, inj, lu, xgdf, name_map):
-    if not os.path.exists(path): return
-    df = pd.read_csv(path)
-    df = normalize_dates(df)
+# ---------- calendar (rest days / congestion) ----------
+def build_calendar(frames):
+    """Sorted int64 keys (team code << 32 | day) of every team appearance in the given fixtures."""
+    if not frames: return pd.Index([]), np.array([], dtype=np.int64)
+    long = pd.concat([pd.DataFrame({"team": f[f"{side}_team"].astype(object), "day": day_numbers(f["date"])})
+                      for f in frames for side in ("home","away")], ignore_index=True).dropna()
+    teams = pd.Index(long["team"].unique())
+    keys = (teams.get_indexer(long["team"]).astype(np.int64) << 32) | long["day"].to_numpy(np.int64)
+    return teams, np.unique(keys)
 
-    # normalize team names
-    if "home_team" in df.columns: df["home_team"] = apply_name_map(df["home_team"], name_map)
-    if "away_team" in df.columns: df["away_team"] = apply_name_map(df["away_team"], name_map)
+def apply_calendar(df, calendar):
+    """Days since each side's previous match and matches played in the previous 7/14/30 days.
 
+    One searchsorted pass over the sorted calendar keys per side; no per-fixture loop.
+    Teams without an earlier match get the old default of 4 rest days.
+    """
+    teams, keys = calendar
+    days = day_numbers(df["date"])
+    for side in ("home","away"):
+        code = schema.team_codes(teams, df[f"{side}_team"]).astype(np.int64)
+        ok = (code >= 0) & ~np.isnan(days)
+        q = (code << 32) | np.where(ok, days, 0).astype(np.int64)
+        pos = np.searchsorted(keys, q, side="left")
+        prev = keys[np.maximum(pos - 1, 0)] if len(keys) else q
+        has_prev = ok & (pos > 0) & ((prev >> 32) == code)
+        df[f"{side}_rest_days"] = np.where(has_prev, q - prev, 4)
+        for w in CONGESTION_WINDOWS:
+            n = pos - np.searchsorted(keys, q - w, side="left")
+            df[f"{side}_matches_{w}d"] = np.where(ok, n, 0)
+    return df
+
+def prepare_lines(lines, resolver):
+    """odds_history.fixture_lines() keyed by match_id, so they join onto HIST and UPCOMING alike."""
+    if lines is None or lines.empty: return None
+    lines = prepare_raw(lines, resolver)
+    lines = lines.set_index(match_ids(lines["date"], lines["home_team"], lines["away_team"]).values)
+    return lines[~lines.index.duplicated(keep="last")]
+
+def apply_odds_lines(df, lines, stat):
+    """Opening and `stat` ("latest" or "close") h2h odds, plus the move between them.
+
+    {side}_odds_move = {side}_odds_{stat} / {side}_odds_open - 1: negative when the price
+    shortened (steam), positive when it drifted. NaN for fixtures never logged.
+    """
+    cols = [f"{side}_odds_{s}" for s in ("open", stat) for side in ("home","draw","away")]
+    df = df.drop(columns=[c for c in df.columns if c.endswith(("_odds_open","_odds_latest","_odds_close","_odds_move"))])
+    looked_up = lines.reindex(df["match_id"].values, columns=cols) if lines is not None \
+        else pd.DataFrame(np.nan, index=df.index, columns=cols)
+    for c in cols: df[c] = looked_up[c].to_numpy(dtype=float)
+    for side in ("home","draw","away"):
+        df[f"{side}_odds_move"] = df[f"{side}_odds_{stat}"] / df[f"{side}_odds_open"] - 1.0
+    return df
+
+def enrich_frame(df, teams, stad, refs, inj, lu, xgdf):
     df = ensure_cols(df, {
         "home_team":"", "away_team":"",
         "home_odds_dec":None,"draw_odds_dec":None,"away_odds_dec":None,
@@ -168,34 +321,141 @@ def enrich_file(path, teams, stad, refs, inj, lu, xgdf, name_map):
         "home_travel_km":0.0,"away_travel_km":200.0
     })
 
-    df = merge_team_master(df, teams)
-    df = apply_injuries(df, inj)
-    df = apply_lineup_flags(df, lu)
-    df = apply_ref_rates(df, refs)
-    df = compute_travel(df, stad)
-    df = merge_xg_hybrid(df, xgdf)
+    # one team encoding for the whole frame; every module below is a column lookup
+    idx = TeamIndex(teams, stad, inj, lu, xgdf)
+    codes = idx.encode(df)
+    df = merge_team_master(df, teams, idx, codes)
+    df = apply_injuries(df, inj, idx, codes)
+    df = apply_lineup_flags(df, lu, idx, codes)
+    df = compute_travel(df, stad, idx, codes)
+    df = merge_xg_hybrid(df, xgdf, idx, codes)
+    df = apply_ref_rates(df, refs)  # last: the refs merge rebuilds the row index
+    return df
 
-    df.to_csv(path, index=False)
-    print(f"Enriched {path} with {len(df)} rows")
+# ---------- incremental engine ----------
+def team_hashes(df):
+    """Order-independent content hash of each team's rows in a team-keyed table."""
+    if df is None or df.empty or "team" not in df.columns: return {}
+    h = pd.util.hash_pandas_object(df, index=False).astype("uint64")
+    return {str(t): f"{v:016x}" for t, v in h.groupby(df["team"].astype(str).values).sum().items()}
 
-def main():
-    teams = safe_read(os.path.join(DATA_DIR, "teams_master.csv"))
-    stad  = safe_read(os.path.join(DATA_DIR, "stadiums.csv"))
-    refs  = safe_read(os.path.join(DATA_DIR, "ref_baselines.csv"))
-    inj   = safe_read(os.path.join(DATA_DIR, "injuries.csv"))
-    lu    = safe_read(os.path.join(DATA_DIR, "lineups.csv"))
-    xgdf  = safe_read(os.path.join(DATA_DIR, "xg_metrics_hybrid.csv"))
-    name_map = load_name_map(os.path.join(DATA_DIR, "team_name_map.csv"))
-
-    # Normalize names in reference tables
+def reference_state(tables, refs, name_map):
+    """Fingerprint of every enrichment input: per-team hashes for team-keyed tables,
+    one hash for the inputs that affect every row (refs, name map, engine version)."""
+    nm = pd.DataFrame(sorted(name_map.items()), columns=["raw","canonical"])
+    settings = json.dumps({"staleness": STALENESS_DAYS}, sort_keys=True)
+    return {"version": ENRICH_VERSION, "global": frame_hash(refs.astype(str)) + frame_hash(nm) + settings,
+            "teams": {name: team_hashes(t) for name, t in tables.items()}}
+
+def changed_teams(old, new):
+    out = set()
+    for name, cur in new["teams"].items():
+        prev = old.get("teams", {}).get(name, {})
+        out.update(t for t in cur.keys() | prev.keys() if cur.get(t) != prev.get(t))
+    return out
+
+def prepare_raw(df, resolver):
+    if df is None or "date" not in df.columns: return None  # missing raw file
+    df = normalize_dates(df.copy())
+
+    # canonical team names
+    if "home_team" in df.columns: df["home_team"] = resolver.resolve(df["home_team"])
+    if "away_team" in df.columns: df["away_team"] = resolver.resolve(df["away_team"])
+    return ensure_cols(df, {"home_team":"", "away_team":""})
+
+def enrich_file(df, path, out_path, tables, refs, ref_state, prev_state, calendar=None, lines=None, stat=None):
+    """Enrich the prepared raw frame from `path` into `out_path`, re-enriching only new/changed fixtures.
+
+    Rows are keyed by match_id (day + canonical teams). A previously enriched row is reused
+    when its raw content hash is unchanged and none of the reference data touching either
+    team changed since the last run. Calendar features are recomputed for every row since
+    a new fixture changes its neighbours' rest days, and odds-history lines (when `stat` is
+    given) since prices keep moving. Returns (enriched frame, state to persist).
+    """
+    if df is None: return None, prev_state
+    df["src_hash"] = row_hashes(df)
+    df.insert(0, "match_id", match_ids(df["date"], df["home_team"], df["away_team"]))
+    df = df.drop_duplicates("match_id", keep="last").reset_index(drop=True)
+
+    prev = pd.DataFrame()
+    if not ENRICH_FULL and os.path.exists(out_path) and prev_state.get("version") == ENRICH_VERSION \
+            and prev_state.get("global") == ref_state["global"]:
+        prev = schema.read(out_path)
+    if not prev.empty and {"match_id","src_hash"}.issubset(prev.columns):
+        prev = prev.astype({c: df[c].dtype for c in ("home_team","away_team")})  # kept rows' teams are all in df
+        stale = changed_teams(prev_state, ref_state)
+        prev = prev[~prev["home_team"].isin(stale) & ~prev["away_team"].isin(stale)]
+        prev = prev.merge(df[["match_id","src_hash"]], on=["match_id","src_hash"], how="inner")
+    else:
+        prev = pd.DataFrame(columns=["match_id"])
+
+    dirty = df[~df["match_id"].isin(prev["match_id"])]
+    fresh = enrich_frame(dirty.copy(), tables["teams_master"], tables["stadiums"], refs, tables["injuries"],
+                         tables["lineups"], tables["xg_hybrid"]) if len(dirty) else dirty
+    fresh = schema.coerce(fresh, schema.table_name(out_path))
+    out = pd.concat([prev, fresh], ignore_index=True) if len(prev) else fresh
+    order = pd.Series(range(len(df)), index=df["match_id"])
+    out = out.iloc[order.reindex(out["match_id"]).argsort().values] if len(out) else out
+    if calendar is not None and len(out): out = apply_calendar(out.reset_index(drop=True), calendar)
+    if stat and len(out): out = apply_odds_lines(out.reset_index(drop=True), lines, stat)
+    out.to_csv(out_path, index=False)
+    print(f"Enriched {path} -> {out_path}: {len(out)} rows ({len(fresh)} re-enriched, {len(prev)} reused)")
+    return out, ref_state
+
+def load_tables():
+    """Reference tables from DATA_DIR, in enrich_all() argument order."""
+    return (safe_read(os.path.join(DATA_DIR, "teams_master.csv")),
+            safe_read(os.path.join(DATA_DIR, "stadiums.csv")),
+            safe_read(os.path.join(DATA_DIR, "ref_baselines.csv")),
+            safe_read(os.path.join(DATA_DIR, "injuries.csv")),
+            safe_read(os.path.join(DATA_DIR, "lineups.csv")),
+            safe_read(os.path.join(DATA_DIR, "xg_metrics_hybrid.csv")),
+            load_name_map(NAME_MAP_PATH),
+            safe_read(os.path.join(DATA_DIR, "odds_lines.csv")))
+
+def enrich_all(raws, teams, stad, refs, inj, lu, xgdf, name_map, lines=None):
+    """Enrich raw frames (raw file name -> DataFrame or None); returns enriched file name -> DataFrame.
+
+    Enriched files are still written here: the incremental engine reuses them on the next run.
+    """
+    # Canonical names in reference tables (on copies; callers may share these frames).
+    # teams_master and stadiums are the curated team lists every other source resolves to.
+    teams, stad, inj, lu, xgdf = (df_.copy() if df_ is not None else pd.DataFrame()
+                                  for df_ in (teams, stad, inj, lu, xgdf))
+    known = [t for df_ in (teams, stad) if "team" in df_.columns for t in df_["team"].dropna().astype(str).str.strip()]
+    resolver = NameResolver(name_map, known)
     for df_ in (teams, stad, inj, lu, xgdf):
-        if df_ is not None and not df_.empty:
-            if "team" in df_.columns:
-                df_["team"] = apply_name_map(df_["team"], name_map)
+        if not df_.empty and "team" in df_.columns:
+            df_["team"] = resolver.resolve(df_["team"])
+
+    raws = {raw: prepare_raw(raws.get(raw), resolver) for raw in OUTPUTS}
+    lines = prepare_lines(lines, resolver)
+    resolver.save()
+    resolver.report()
+    schema.share_teams(teams, stad, inj, lu, xgdf, lines, *raws.values())  # one team dtype for the run
+    # rest days / congestion come from the merged HIST + UPCOMING schedule
+    calendar = build_calendar([d for d in raws.values() if d is not None and not d.empty])
 
-    enrich_file(os.path.join(DATA_DIR, "raw_football_data.csv"), teams, stad, refs, inj, lu, xgdf, name_map)
-    enrich_file(os.path.join(DATA_DIR, "raw_theodds_fixtures.csv"), teams, stad, refs, inj, lu, xgdf, name_map)
+    tables = {"teams_master": teams, "stadiums": stad, "injuries": inj, "lineups": lu, "xg_hybrid": xgdf}
+    ref_state = reference_state(tables, refs, resolver.name_map)
+    state = {}
+    if os.path.exists(STATE_PATH):
+        with open(STATE_PATH) as f: state = json.load(f)
+    out = {}
+    for raw, enriched in OUTPUTS.items():
+        out[enriched], state[enriched] = enrich_file(raws[raw], os.path.join(DATA_DIR, raw),
+                                                     os.path.join(DATA_DIR, enriched), tables, refs,
+                                                     ref_state, state.get(enriched, {}), calendar,
+                                                     lines, LINE_STAT.get(enriched))
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    with open(STATE_PATH, "w") as f: json.dump(state, f)
     print("Enrichment complete.")
+    return out
+
+def main():
+    raws = {raw: schema.read(os.path.join(DATA_DIR, raw)) for raw in OUTPUTS
+            if os.path.exists(os.path.join(DATA_DIR, raw))}
+    enrich_all(raws, *load_tables())
 
 if __name__ == "__main__":
     main()
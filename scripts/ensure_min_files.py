@@ -3,9 +3,9 @@
 
 import os
 import pandas as pd
+from utils import csv_header
 
 DATA = "data"
-os.makedirs(DATA, exist_ok=True)
 
 def ensure_csv(path, header_cols):
     """Create or fix a CSV so it has a valid header row (no EmptyDataError)."""
@@ -14,31 +14,25 @@ def ensure_csv(path, header_cols):
         print(f"[OK] created missing {path}")
         return
 
-    # If it exists, verify it has a header; if not, rewrite with header
-    try:
-        df = pd.read_csv(path)
-        # If the file had content but no columns parsed (rare edge), rewrite header
-        if len(df.columns) == 0:
-            raise ValueError("no header")
-    except Exception:
+    # If it exists, verify it has a header (first line only); if not, rewrite with header
+    if not any(c.strip() for c in csv_header(path)):
         pd.DataFrame(columns=header_cols).to_csv(path, index=False)
         print(f"[OK] fixed empty or malformed {path}")
 
 # Minimal schemas for required CSVs
-ensure_csv(os.path.join(DATA, "teams_master.csv"),
-           ["team","gk_rating","setpiece_rating","crowd_index"])
-
-ensure_csv(os.path.join(DATA, "stadiums.csv"),
-           ["team","stadium","lat","lon"])
-
-ensure_csv(os.path.join(DATA, "ref_baselines.csv"),
-           ["ref_name","ref_pen_rate"])
-
-ensure_csv(os.path.join(DATA, "injuries.csv"),
-           ["date","team","injury_index"])
-
-ensure_csv(os.path.join(DATA, "lineups.csv"),
-           ["date","team","key_att_out","key_def_out","keeper_changed"])
-
-ensure_csv(os.path.join(DATA, "team_name_map.csv"),
-           ["raw","canonical"])
\ No newline at end of file
+MIN_SCHEMAS = {
+    "teams_master.csv": ["team","gk_rating","setpiece_rating","crowd_index"],
+    "stadiums.csv": ["team","stadium","lat","lon"],
+    "ref_baselines.csv": ["ref_name","ref_pen_rate"],
+    "injuries.csv": ["date","team","injury_index"],
+    "lineups.csv": ["date","team","key_att_out","key_def_out","keeper_changed"],
+    "team_name_map.csv": ["raw","canonical"],
+}
+
+def main():
+    os.makedirs(DATA, exist_ok=True)
+    for name, cols in MIN_SCHEMAS.items():
+        ensure_csv(os.path.join(DATA, name), cols)
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,15 @@
 # scripts/fetch_fbr_team_xg.py
-# Fetch team xG/xGA/xGD from FBR API for current + last season, build hybrid (60% current, 40% last)
+# Fetch team xG/xGA/xGD from FBR API for the last XG_SEASONS seasons and blend them into per-90
+# hybrid rates: season weights decay by XG_DECAY per season of age and scale with matches played,
+# and every team is shrunk toward its league mean by XG_PRIOR_MATCHES matches' worth of prior
+# (promoted teams without top-flight history lean on it most).
 # Writes:
 #   data/xg_metrics_current.csv
 #   data/xg_metrics_last.csv
 #   data/xg_metrics_hybrid.csv
 
-import os, sys, time, requests, pandas as pd
+import os, pandas as pd
+from utils import TokenBucket, cached_json, get_session
 
 API_KEY = os.environ.get("FBR_API_KEY", "").strip()
 BASE = "https://fbrapi.com"
@@ -14,29 +18,54 @@ DATA_DIR = "data"
 # Big-5 leagues (FBref IDs). Add more if you want:
 LEAGUE_IDS = [9, 12, 11, 20, 13]  # EPL, LaLiga, Serie A, Bundesliga, Ligue 1
 
-def get(path, params=None):
-    h = {"X-API-Key": API_KEY} if API_KEY else {}
-    r = requests.get(f"{BASE}{path}", params=params or {}, headers=h, timeout=30)
-    if r.status_code != 200:
-        print(f"[WARN] GET {path} {params} -> {r.status_code} {r.text[:200]}")
-        return None
-    try:
-        return r.json()
-    except Exception as e:
-        print("[WARN] JSON error:", e, r.text[:200]); return None
+# FBR allows one request every 3 s; the bucket spaces requests exactly that far apart.
+FBR_MIN_INTERVAL = float(os.environ.get("FBR_MIN_INTERVAL", "3.0"))
+# Response cache: season lists and the in-progress season expire, completed seasons never do (a
+# season cached while in progress is fetched once more after it completes).
+CACHE_DIR = os.path.join(DATA_DIR, ".cache", "fbr")
+SEASONS_TTL = float(os.environ.get("FBR_SEASONS_TTL_HOURS", "168")) * 3600
+CURRENT_TTL = float(os.environ.get("FBR_CURRENT_TTL_HOURS", "12")) * 3600
+
+# Hybrid blend: K seasons, weight XG_DECAY ** age (the defaults give roughly the old 60/40 split
+# between two full seasons)
+XG_SEASONS = int(os.environ.get("XG_SEASONS", "2"))
+XG_DECAY = float(os.environ.get("XG_DECAY", str(2 / 3)))
+XG_PRIOR_MATCHES = float(os.environ.get("XG_PRIOR_MATCHES", "5"))
+
+_bucket = TokenBucket(rate=1, per=FBR_MIN_INTERVAL)
+STATS = {"cached": 0, "requests": 0}
+
+def get(path, params=None, ttl=0):
+    """GET an FBR endpoint through the response cache (ttl seconds, None = forever)."""
+    def fetch():
+        _bucket.acquire()
+        STATS["requests"] += 1
+        h = {"X-API-Key": API_KEY} if API_KEY else {}
+        r = get_session().get(f"{BASE}{path}", params=params or {}, headers=h, timeout=30)
+        if r.status_code != 200:
+            print(f"[WARN] GET {path} {params} -> {r.status_code} {r.text[:200]}")
+            return None
+        try:
+            return r.json()
+        except Exception as e:
+            print("[WARN] JSON error:", e, r.text[:200]); return None
+    data, hit = cached_json(CACHE_DIR, [path, params or {}], fetch, ttl)
+    STATS["cached"] += hit
+    return data
 
 def list_seasons_for_league(league_id):
-    js = get("/league-seasons", {"league_id": league_id})
+    js = get("/league-seasons", {"league_id": league_id}, ttl=SEASONS_TTL)
     if not js: return []
     data = js.get("data", js)
     try: data = sorted(data, key=lambda x: x.get("season_id", 0))
     except: pass
     return data
 
-def fetch_standings_xg(league_id, season_id=None):
+def fetch_standings_xg(league_id, season_id=None, completed=False):
+    """Team xG rows for one league season; a completed season's table is cached permanently."""
     params = {"league_id": league_id}
     if season_id: params["season_id"] = season_id
-    js = get("/league-standings", params)
+    js = get("/league-standings", params, ttl=None if completed else CURRENT_TTL)
     if not js: return []
     data = js.get("data", js)
     rows = []
@@ -48,6 +77,7 @@ def fetch_standings_xg(league_id, season_id=None):
             "season_id": season_id,
             "season": row.get("season") or row.get("year"),
             "team": str(team).strip(),
+            "mp": row.get("mp") or row.get("matches_played") or row.get("games"),
             "xg": row.get("xg"),
             "xga": row.get("xga"),
             "xgd": row.get("xgd"),
@@ -61,68 +91,77 @@ def to_df(rows, cols):
     df["team"] = df["team"].str.replace(r"\s+\(.*\)$", "", regex=True).str.strip()
     return df
 
-def main():
-    os.makedirs(DATA_DIR, exist_ok=True)
+XG_COLS = ["league_id","season_id","season","team","mp","xg","xga","xgd","xgd_per90"]
+HYBRID_COLS = ["team","league_id","xg_hybrid","xga_hybrid","xgd_hybrid","xgd90_hybrid","mp_weighted","n_seasons"]
+RATES = ["xg90","xga90","xgd90"]
+
+def per90(long):
+    """Season totals -> per-match rates; mp falls back to xgd / xgd_per90 when not reported."""
+    num = lambda c: pd.to_numeric(long[c], errors="coerce") if c in long.columns else pd.Series(float("nan"), index=long.index)
+    xgd90 = num("xgd_per90")
+    mp = num("mp").fillna((num("xgd") / xgd90.where(xgd90 != 0)).round())
+    mp = mp.where(mp > 0)
+    return long.assign(mp=mp, xg90=num("xg") / mp, xga90=num("xga") / mp,
+                       xgd90=xgd90.fillna((num("xg") - num("xga")) / mp))
+
+def blend(long, decay=XG_DECAY, prior=XG_PRIOR_MATCHES):
+    """One row per (team, league_id) from a long (team, league_id, age, mp, rates) table.
+
+    rate = (sum_s w_s * mp_s * rate_s + prior * league_mean) / (sum_s w_s * mp_s + prior),
+    w_s = decay ** age_s; league means are the same weighted average over the whole league.
+    """
+    if long.empty:
+        return pd.DataFrame(columns=HYBRID_COLS)
+    long = per90(long)
+    w = decay ** long["age"] * long["mp"].fillna(long.groupby(["league_id","age"])["mp"].transform("median")).fillna(1.0)
+    have = long[RATES].notna()
+    wx = long[RATES].mul(w, axis=0).where(have)
+    wsum = have.mul(w, axis=0)
+    keys = [long["team"], long["league_id"]]
+    team_wx, team_w = wx.groupby(keys).sum(), wsum.groupby(keys).sum()
+    league_mean = wx.groupby(long["league_id"]).sum() / wsum.groupby(long["league_id"]).sum()
+    prior_x = league_mean.reindex(team_wx.index.get_level_values("league_id")).set_axis(team_wx.index)
+    out = (team_wx + prior * prior_x) / (team_w + prior)
+    out = out.where(team_w > 0)  # no data at all for that rate: leave it missing
+    out.columns = ["xg_hybrid","xga_hybrid","xgd90_hybrid"]
+    out["xgd_hybrid"] = out["xg_hybrid"] - out["xga_hybrid"]
+    out["mp_weighted"] = w.groupby(keys).sum()
+    out["n_seasons"] = long.groupby(keys)["age"].nunique()
+    return out.reset_index()[HYBRID_COLS]
+
+def fetch_xg():
+    """Return (current, last, hybrid) team xG frames; empty frames when no API key is set.
+
+    The last XG_SEASONS seasons of every league are fetched; finished seasons come from the
+    permanent cache, so raising XG_SEASONS only costs requests for seasons not seen before.
+    """
     if not API_KEY:
-        print("[INFO] No FBR_API_KEY set. Writing empty xg files and exiting.")
-        empty_cols = ["league_id","season_id","season","team","xg","xga","xgd","xgd_per90"]
-        pd.DataFrame(columns=empty_cols).to_csv(os.path.join(DATA_DIR, "xg_metrics_current.csv"), index=False)
-        pd.DataFrame(columns=empty_cols).to_csv(os.path.join(DATA_DIR, "xg_metrics_last.csv"), index=False)
-        pd.DataFrame(columns=["team","xg_hybrid","xga_hybrid","xgd_hybrid","xgd90_hybrid","league_id"]).to_csv(
-            os.path.join(DATA_DIR, "xg_metrics_hybrid.csv"), index=False)
-        sys.exit(0)
-
-    cols = ["league_id","season_id","season","team","xg","xga","xgd","xgd_per90"]
-    cur_rows, last_rows = [], []
+        print("[INFO] No FBR_API_KEY set. Using empty xg tables.")
+        return pd.DataFrame(columns=XG_COLS), pd.DataFrame(columns=XG_COLS), pd.DataFrame(columns=HYBRID_COLS)
 
+    rows = []
     for lid in LEAGUE_IDS:
         seasons = list_seasons_for_league(lid)
         if not seasons:
             print(f"[WARN] No seasons for league_id={lid}"); continue
+        for age, season in enumerate(reversed(seasons[-max(1, XG_SEASONS):])):
+            rows.extend(dict(r, age=age) for r in fetch_standings_xg(lid, season.get("season_id"), completed=age > 0))
+    print(f"[INFO] FBR: {STATS['requests']} requests, {STATS['cached']} served from cache")
+
+    long = to_df(rows, XG_COLS + ["age"])
+    hybrid = blend(long)
+    if len(hybrid):
+        print(f"[INFO] xG hybrid over {XG_SEASONS} seasons (decay {XG_DECAY:.2f}): "
+              f"{int((hybrid['n_seasons'] == 1).sum())} teams with one season lean on their league mean")
+    season = lambda age: long[long["age"] == age][XG_COLS] if len(long) else pd.DataFrame(columns=XG_COLS)
+    return season(0), season(1), hybrid
 
-        current = seasons[-1]
-        previous = seasons[-2] if len(seasons) >= 2 else None
-
-        cur_rows.extend(fetch_standings_xg(lid, current.get("season_id"))); time.sleep(3.2)
-        if previous:
-            last_rows.extend(fetch_standings_xg(lid, previous.get("season_id"))); time.sleep(3.2)
-
-    df_cur = to_df(cur_rows, cols)
-    df_last = to_df(last_rows, cols)
+def main():
+    os.makedirs(DATA_DIR, exist_ok=True)
+    df_cur, df_last, out = fetch_xg()
     df_cur.to_csv(os.path.join(DATA_DIR, "xg_metrics_current.csv"), index=False)
     df_last.to_csv(os.path.join(DATA_DIR, "xg_metrics_last.csv"), index=False)
     print(f"[OK] wrote data/xg_metrics_current.csv ({len(df_cur)}) and data/xg_metrics_last.csv ({len(df_last)})")
-
-    def sel(df, prefix):
-        return df.rename(columns={
-            "xg": f"{prefix}_xg",
-            "xga": f"{prefix}_xga",
-            "xgd": f"{prefix}_xgd",
-            "xgd_per90": f"{prefix}_xgd90",
-        })[["team","league_id",f"{prefix}_xg",f"{prefix}_xga",f"{prefix}_xgd",f"{prefix}_xgd90"]]
-
-    hybrid = sel(df_cur, "cur") if not df_cur.empty else pd.DataFrame(columns=["team","league_id","cur_xg","cur_xga","cur_xgd","cur_xgd90"])
-    if not df_last.empty:
-        hybrid = hybrid.merge(sel(df_last, "last"), on=["team","league_id"], how="outer")
-    else:
-        for c in ["last_xg","last_xga","last_xgd","last_xgd90"]: hybrid[c] = None
-
-    for c in ["cur_xg","cur_xga","cur_xgd","cur_xgd90","last_xg","last_xga","last_xgd","last_xgd90"]:
-        hybrid[c] = pd.to_numeric(hybrid[c], errors="coerce")
-
-    w_cur, w_last = 0.60, 0.40
-    def w(a,b):
-        if pd.notna(a) and pd.notna(b): return w_cur*a + w_last*b
-        if pd.notna(a): return a
-        if pd.notna(b): return b
-        return None
-
-    hybrid["xg_hybrid"]    = [w(a,b) for a,b in zip(hybrid["cur_xg"],   hybrid["last_xg"])]
-    hybrid["xga_hybrid"]   = [w(a,b) for a,b in zip(hybrid["cur_xga"],  hybrid["last_xga"])]
-    hybrid["xgd_hybrid"]   = [w(a,b) for a,b in zip(hybrid["cur_xgd"],  hybrid["last_xgd"])]
-    hybrid["xgd90_hybrid"] = [w(a,b) for a,b in zip(hybrid["cur_xgd90"],hybrid["last_xgd90"])]
-
-    out = hybrid[["team","league_id","xg_hybrid","xga_hybrid","xgd_hybrid","xgd90_hybrid"]].copy()
     out.to_csv(os.path.join(DATA_DIR, "xg_metrics_hybrid.csv"), index=False)
     print(f"[OK] wrote data/xg_metrics_hybrid.csv ({len(out)})")
 
@@ -1,5 +1,7 @@
 import os, pandas as pd
-from utils import download_csv
+from collections import defaultdict
+from utils import download_csv, download_many, cache_summary
+import history_store
 
 OUT_HIST = "data/raw_football_data.csv"
 os.makedirs("data", exist_ok=True)
@@ -27,12 +29,34 @@ URLS_2324 = [
 
 URLS = URLS_2425 + URLS_2324  # combine; comment out 2324 if you only want current season
 
+# Finished seasons never change: once cached they are served from disk without a request.
+FROZEN_SEASONS = {s.strip() for s in os.environ.get("FD_FROZEN_SEASONS", "2324").split(",") if s.strip()}
+
+def season_of(url: str) -> str:
+    return url.rstrip("/").split("/")[-2]
+
+def league_of(url: str) -> str:
+    return os.path.splitext(url.rstrip("/").split("/")[-1])[0]
+
+# Only the columns normalize() reads are parsed; the ~100 other bookmaker columns are skipped.
+# Goals and odds are read as text and converted in normalize(), so a stray cell becomes NaN
+# instead of failing the whole season file.
+ODDS_FALLBACK = {o: [f"{bm}{o}" for bm in ("B365","PS","WH","IW")] for o in "HDA"}
+USECOLS = {"DATE","HOMETEAM","AWAYTEAM","FTHG","FTAG"} | {c for cols in ODDS_FALLBACK.values() for c in cols}
+DTYPES = defaultdict(lambda: "object", {"Date": "string", "HomeTeam": "string", "AwayTeam": "string"})
+NUMERIC = {"home_goals": "Int16", "away_goals": "Int16",
+           "home_odds_dec": "float64", "draw_odds_dec": "float64", "away_odds_dec": "float64"}
+
+def fetch(url: str) -> pd.DataFrame:
+    return download_csv(url, frozen=season_of(url) in FROZEN_SEASONS,
+                        usecols=lambda c: c.strip().upper() in USECOLS, dtype=DTYPES)
+
 def normalize(df: pd.DataFrame) -> pd.DataFrame:
     cols = df.columns.str.upper()
     df.columns = cols
-    oddsH = next((c for c in ["B365H","PSH","WHH","IWH"] if c in df.columns), None)
-    oddsD = next((c for c in ["B365D","PSD","WHD","IWD"] if c in df.columns), None)
-    oddsA = next((c for c in ["B365A","PSA","WHA","IWA"] if c in df.columns), None)
+    oddsH = next((c for c in ODDS_FALLBACK["H"] if c in df.columns), None)
+    oddsD = next((c for c in ODDS_FALLBACK["D"] if c in df.columns), None)
+    oddsA = next((c for c in ODDS_FALLBACK["A"] if c in df.columns), None)
     keep = {
         "date": "DATE","home_team":"HOMETEAM","away_team":"AWAYTEAM",
         "home_goals":"FTHG","away_goals":"FTAG",
@@ -41,6 +65,7 @@ def normalize(df: pd.DataFrame) -> pd.DataFrame:
     out = {}
     for k,v in keep.items():
         out[k] = df[v] if v is not None and v in df.columns else pd.Series([None]*len(df))
+    for k,t in NUMERIC.items(): out[k] = pd.to_numeric(out[k], errors="coerce").astype(t)
     out_df = pd.DataFrame(out).dropna(subset=["date","home_team","away_team"])
     out_df["date"] = pd.to_datetime(out_df["date"], dayfirst=True, errors="coerce")
     out_df = out_df.dropna(subset=["date"])
@@ -52,32 +77,42 @@ def normalize(df: pd.DataFrame) -> pd.DataFrame:
     out_df["ref_pen_rate"]=0.30; out_df["crowd_index"]=0.7
     return out_df
 
-def main():
-    frames=[]
-    for u in URLS:
-        try:
-            df = download_csv(u)
-            if df is not None and len(df):
-                frames.append(normalize(df))
-                print("OK:", u)
-            else:
-                print("Empty or invalid:", u)
-        except Exception as e:
-            print("Skipped:", u, "|", e)
+EMPTY_COLS = ["date","home_team","away_team","home_goals","away_goals",
+              "home_odds_dec","draw_odds_dec","away_odds_dec",
+              "home_rest_days","away_rest_days","home_travel_km","away_travel_km",
+              "home_injury_index","away_injury_index","home_gk_rating","away_gk_rating",
+              "home_setpiece_rating","away_setpiece_rating","ref_pen_rate","crowd_index"]
+
+def fetch_history() -> pd.DataFrame:
+    """Download and normalize every season file into the history store (data/history) and
+    return the configured leagues and seasons from it; empty-but-valid schema if there are none.
 
-    if frames:
-        hist = pd.concat(frames, ignore_index=True).sort_values("date")
-        hist.to_csv(OUT_HIST, index=False)
-        print("Saved", OUT_HIST, len(hist))
-    else:
-        # Write an empty but correctly structured file so the pipeline can continue gracefully
-        empty_cols = ["date","home_team","away_team","home_goals","away_goals",
-                      "home_odds_dec","draw_odds_dec","away_odds_dec",
-                      "home_rest_days","away_rest_days","home_travel_km","away_travel_km",
-                      "home_injury_index","away_injury_index","home_gk_rating","away_gk_rating",
-                      "home_setpiece_rating","away_setpiece_rating","ref_pen_rate","crowd_index"]
-        pd.DataFrame(columns=empty_cols).to_csv(OUT_HIST, index=False)
-        print("Warning: no historical files fetched. Wrote empty schema to", OUT_HIST)
+    A file that fails to download keeps its previously stored partition.
+    """
+    rewritten = 0
+    # Downloads run concurrently (see utils.HTTP_MAX_WORKERS / HTTP_PER_HOST); results arrive
+    # in URLS order so each file is normalized while the later ones are still downloading.
+    for u, df, err in download_many(URLS, fetch=fetch):
+        if err is not None:
+            print("Skipped:", u, "|", err)
+        elif df is not None and len(df):
+            rewritten += history_store.write_partition(league_of(u), season_of(u), normalize(df))
+            print("OK:", u)
+        else:
+            print("Empty or invalid:", u)
+    print(cache_summary())
+    print(f"[INFO] history store: {rewritten} of {len(URLS)} partitions rewritten")
+    hist = history_store.read(leagues={league_of(u) for u in URLS}, seasons={season_of(u) for u in URLS})
+    if hist.empty:
+        print("Warning: no historical files fetched.")
+        return pd.DataFrame(columns=EMPTY_COLS)
+    return hist
+
+def main():
+    hist = fetch_history()
+    # an empty but correctly structured file lets the pipeline continue gracefully
+    hist.to_csv(OUT_HIST, index=False)
+    print("Saved", OUT_HIST, len(hist))
 
 if __name__=="__main__":
-    main()
\ No newline at end of file
+    main()
@@ -3,11 +3,16 @@
 # 1) Manual override: if data/manual_odds.csv exists, use it and skip the API.
 # 2) Otherwise: query The Odds API, auto-detect the UCL sport key if not set,
 #    try multiple regions, and FAIL GRACEFULLY by writing an empty CSV (exit 0).
+# 3) --watch: keep polling, faster as kickoff nears, within the API quota, and rewrite the
+#    CSV only when prices move.
 
 import os
-import sys
-import requests
+import time
+import argparse
+import numpy as np
 import pandas as pd
+from utils import get_session, row_hashes
+import odds_history
 
 OUT_UPCOMING = "data/raw_theodds_fixtures.csv"
 MANUAL_ODDS = "data/manual_odds.csv"
@@ -16,41 +21,51 @@ MANUAL_ODDS = "data/manual_odds.csv"
 API_KEY = os.environ.get("THE_ODDS_API_KEY", "").strip()
 SPORT = os.environ.get("ODDS_SPORT_KEY", "").strip()     # optional: force a sport key via secret
 REGIONS = os.environ.get("ODDS_REGIONS", "eu,uk,us,au").strip()
-MARKETS = os.environ.get("ODDS_MARKETS", "h2h").strip()
+MARKETS = os.environ.get("ODDS_MARKETS", "h2h").strip()  # e.g. "h2h,totals,spreads" (each costs quota)
 
-BASE = "https://api.the-odds-api.com/v4"
+BASE = os.environ.get("ODDS_API_BASE", "https://api.the-odds-api.com/v4").rstrip("/")  # override to test locally
 
-def write_empty_and_exit(msg: str) -> None:
-    """Write an empty-but-valid CSV so downstream steps continue, then exit 0."""
-    cols = ["date","home_team","away_team","home_odds_dec","draw_odds_dec","away_odds_dec"]
-    pd.DataFrame(columns=cols).to_csv(OUT_UPCOMING, index=False)
+# Last seen x-requests-remaining / x-requests-used / x-requests-last response headers
+QUOTA = {"remaining": None, "used": None, "last": None}
+
+UPCOMING_COLS = ["date","home_team","away_team","home_odds_dec","draw_odds_dec","away_odds_dec"]
+
+def empty_upcoming(msg: str) -> pd.DataFrame:
+    """Empty-but-valid frame so downstream steps continue (the script still exits 0)."""
     print("WARNING:", msg)
-    print("Wrote empty", OUT_UPCOMING)
-    sys.exit(0)
+    return pd.DataFrame(columns=UPCOMING_COLS)
 
-def use_manual_odds_if_present() -> bool:
-    """If data/manual_odds.csv exists and is valid, convert -> OUT_UPCOMING and return True."""
+def load_manual_odds():
+    """If data/manual_odds.csv exists and is valid, return it normalized; else None."""
     if not os.path.exists(MANUAL_ODDS):
-        return False
+        return None
     try:
         df = pd.read_csv(MANUAL_ODDS)
     except Exception as e:
         print("manual_odds.csv read error:", e, "— falling back to API...")
-        return False
+        return None
 
-    needed = {"date","home_team","away_team","home_odds_dec","draw_odds_dec","away_odds_dec"}
+    needed = set(UPCOMING_COLS)
     if not needed.issubset(df.columns) or df.empty:
         print("manual_odds.csv present but invalid columns/empty — falling back to API...")
-        return False
+        return None
+
+    df["date"] = kickoff_times(df["date"])
+    print(f"Using manual odds: {MANUAL_ODDS} ({len(df)} rows)")
+    return df
 
-    df["date"] = pd.to_datetime(df["date"], errors="coerce").dt.tz_localize(None)
-    df.to_csv(OUT_UPCOMING, index=False)
-    print(f"Using manual odds: {MANUAL_ODDS} → wrote {OUT_UPCOMING} ({len(df)} rows)")
-    return True
+def api_get(url: str, params: dict):
+    """GET against The Odds API, recording the quota headers it returns in QUOTA."""
+    r = get_session().get(url, params=params, timeout=60)
+    for h in ("x-requests-remaining", "x-requests-used", "x-requests-last"):
+        if h in r.headers:
+            try: QUOTA[h.rsplit("-", 1)[1]] = float(r.headers[h])
+            except ValueError: pass
+    return r
 
 def list_sports(api_key: str):
     url = f"{BASE}/sports/"
-    r = requests.get(url, params={"apiKey": api_key}, timeout=60)
+    r = api_get(url, {"apiKey": api_key})
     if r.status_code != 200:
         print("Sports list error:", r.status_code, r.text)
         return []
@@ -64,90 +79,279 @@ def fetch_odds(api_key: str, sport_key: str, regions: str, markets: str):
         "markets": markets,
         "oddsFormat": "decimal",
     }
-    r = requests.get(url, params=params, timeout=60)
+    r = api_get(url, params)
     if r.status_code != 200:
         print("Fetch odds error:", r.status_code, r.text)
         return None
     return r.json()
 
-def main():
+def resolve_sport_key(api_key: str):
+    """Return (sport_key, None) or (None, error message)."""
+    if SPORT:
+        return SPORT, None
+    sports = list_sports(api_key)
+    if not sports:
+        return None, "Could not retrieve sports list — check API key/plan/connectivity."
+
+    # Print a small subset for debug
+    print("Available sports keys (first 25):")
+    for s in sports[:25]:
+        print("-", s.get("key"), "|", s.get("title"))
+
+    # Try to choose a UCL-looking key automatically
+    candidates = [
+        s for s in sports
+        if "soccer" in (s.get("key") or "")
+        and ("uefa" in (s.get("key") or "") or "champ" in (s.get("key") or ""))
+    ]
+    if candidates:
+        print("Auto-selected sport_key:", candidates[0]["key"])
+        return candidates[0]["key"], None
+    # Fallback to EPL so pipeline still runs
+    fallback = [s for s in sports if s.get("key") in ("soccer_epl","soccer_uefa_europa_league")]
+    if fallback:
+        print("No UCL key found; using fallback:", fallback[0]["key"])
+        return fallback[0]["key"], None
+    return None, "No suitable soccer sport_key found for your account/plan."
+
+# ---------- payload -> columnar prices ----------
+PRICE_COLS = ["game_id","commence_time","home_team","away_team","bookmaker","last_update",
+              "market","outcome","point","price"]
+
+def _unnest(df, col, fields):
+    """Explode the list column `col` and spread `fields` (key -> column) of its dicts into columns."""
+    df = df.explode(col, ignore_index=True).dropna(subset=[col])
+    inner = pd.DataFrame(df.pop(col).tolist(), index=df.index).reindex(columns=list(fields))
+    return df.join(inner.rename(columns=fields))
+
+def flatten_odds(data) -> pd.DataFrame:
+    """One row per game x bookmaker x market x outcome, unnested one level at a time.
+
+    `outcome` is normalised to home/draw/away for h2h and spreads and to over/under for totals.
+    """
+    df = pd.DataFrame(data or [], columns=["id","commence_time","home_team","away_team","bookmakers"])
+    df = _unnest(df.rename(columns={"id": "game_id"}), "bookmakers",
+                 {"key": "bookmaker", "last_update": "last_update", "markets": "markets"})
+    df = _unnest(df, "markets", {"key": "market", "outcomes": "outcomes"})
+    df = _unnest(df, "outcomes", {"name": "outcome", "point": "point", "price": "price"})
+    df["price"] = pd.to_numeric(df["price"], errors="coerce")
+    df["point"] = pd.to_numeric(df["point"], errors="coerce")
+    name = df["outcome"].astype("string")
+    df["outcome"] = np.select(
+        [name.eq(df["home_team"]).fillna(False), name.eq(df["away_team"]).fillna(False),
+         name.isin(["Draw","Tie"]).fillna(False), name.str.lower().isin(["over","under"]).fillna(False)],
+        ["home", "away", "draw", name.str.lower().fillna("")], default="")
+    return df[(df["outcome"] != "") & (df["price"] > 1.0)].reset_index(drop=True)
+
+def _main_line(df):
+    """Per game, the handicap/total quoted by most bookmakers (ties -> the lower line)."""
+    n = df.groupby(["game_id","point"]).size().rename("n").reset_index()
+    n = n.sort_values(["game_id","n","point"], ascending=[True, False, True]).drop_duplicates("game_id")
+    return df.merge(n[["game_id","point"]], on=["game_id","point"])
+
+def consensus(prices: pd.DataFrame) -> pd.DataFrame:
+    """Per-fixture consensus over all bookmakers, via vectorized groupbys on the flat table.
+
+    h2h: median price (the *_odds_dec columns), best price, mean implied probability and the
+    mean/min per-bookmaker overround. totals/spreads (when requested in ODDS_MARKETS): main
+    line plus median prices.
+    """
+    h2h = prices[prices["market"] == "h2h"].assign(implied=lambda d: 1.0 / d["price"])
+    g = h2h.groupby(["game_id","outcome"])
+    wide = pd.concat({"odds_dec": g["price"].median(), "odds_best": g["price"].max(),
+                      "implied_mean": g["implied"].mean()}, axis=1).unstack("outcome")
+    wide = wide.reindex(columns=pd.MultiIndex.from_product([["odds_dec","odds_best","implied_mean"],
+                                                            ["home","draw","away"]]))
+    wide.columns = [f"{side}_{stat}" for stat, side in wide.columns]
+    book = h2h.groupby(["game_id","bookmaker"])
+    over = (book["implied"].sum() - 1.0)[book["outcome"].nunique() == 3].groupby("game_id")
+    wide = wide.join(pd.concat({"overround_mean": over.mean(), "overround_min": over.min(),
+                                "n_bookmakers": h2h.groupby("game_id")["bookmaker"].nunique()}, axis=1))
+
+    for market, sides, line in (("totals", ("over","under"), "totals_line"),
+                                ("spreads", ("home","away"), "spreads_home_line")):
+        m = prices[prices["market"] == market]
+        if m.empty: continue
+        m = m.assign(point=np.where(m["outcome"] == "away", -m["point"], m["point"]))  # home-side handicap
+        m = _main_line(m)
+        med = m.groupby(["game_id","outcome"])["price"].median().unstack("outcome")
+        med = med.reindex(columns=list(sides)).add_prefix(f"{market}_").add_suffix("_odds")
+        wide = wide.join(med).join(m.groupby("game_id")["point"].first().rename(line))
+    return wide
+
+def normalize_odds(data, prices=None) -> pd.DataFrame:
+    """One row per game: fixture columns plus consensus prices (NaN when nobody quotes it)."""
+    games = pd.DataFrame([{"game_id": g.get("id"), "date": g.get("commence_time"),
+                           "home_team": g.get("home_team"), "away_team": g.get("away_team")}
+                          for g in data or []], columns=["game_id","date","home_team","away_team"])
+    prices = flatten_odds(data) if prices is None else prices
+    if not prices.empty:
+        games = games.join(consensus(prices), on="game_id")
+    games = ensure_odds_cols(games)
+    return games.drop(columns=["game_id"])
+
+def kickoff_times(dates) -> pd.Series:
+    """Kick-off times as naive UTC; the feed's "...Z" strings and naive ones compare alike."""
+    return pd.to_datetime(dates, utc=True, errors="coerce", format="mixed").dt.tz_localize(None)
+
+def ensure_odds_cols(df):
+    for c in UPCOMING_COLS:
+        if c not in df.columns: df[c] = None
+    return df
+
+def fetch_upcoming() -> pd.DataFrame:
     # 0) Manual override path (step 4: use your own odds file if present)
-    if use_manual_odds_if_present():
-        return
+    manual = load_manual_odds()
+    if manual is not None:
+        return manual
 
     # 1) API key required for automatic odds
     if not API_KEY:
-        write_empty_and_exit("Missing THE_ODDS_API_KEY (GitHub Secret). Using empty upcoming file.")
+        return empty_upcoming("Missing THE_ODDS_API_KEY (GitHub Secret). Using empty upcoming file.")
 
-    # 2) Get available sports and auto-detect a Champions League key if not provided
-    sports = list_sports(API_KEY)
-    if not sports:
-        write_empty_and_exit("Could not retrieve sports list — check API key/plan/connectivity.")
-
-    sport_key = SPORT
-    if not sport_key:
-        # Print a small subset for debug
-        print("Available sports keys (first 25):")
-        for s in sports[:25]:
-            print("-", s.get("key"), "|", s.get("title"))
-
-        # Try to choose a UCL-looking key automatically
-        candidates = [
-            s for s in sports
-            if "soccer" in (s.get("key") or "")
-            and ("uefa" in (s.get("key") or "") or "champ" in (s.get("key") or ""))
-        ]
-        if candidates:
-            sport_key = candidates[0]["key"]
-            print("Auto-selected sport_key:", sport_key)
-        else:
-            # Fallback to EPL so pipeline still runs
-            fallback = [s for s in sports if s.get("key") in ("soccer_epl","soccer_uefa_europa_league")]
-            if fallback:
-                sport_key = fallback[0]["key"]
-                print("No UCL key found; using fallback:", sport_key)
-            else:
-                write_empty_and_exit("No suitable soccer sport_key found for your account/plan.")
+    # 2) Resolve the sport key (auto-detect a Champions League key if not provided)
+    sport_key, err = resolve_sport_key(API_KEY)
+    if err:
+        return empty_upcoming(err)
 
     # 3) Fetch odds
     data = fetch_odds(API_KEY, sport_key, REGIONS, MARKETS)
     if data is None:
-        write_empty_and_exit(f"Odds fetch failed for sport_key={sport_key}. Writing empty file to continue.")
-
-    # 4) Normalize and write
-    rows = []
-    for game in data:
-        home = game.get("home_team")
-        away = game.get("away_team")
-        commence = game.get("commence_time")
-        home_odds = draw_odds = away_odds = None
-
-        for bm in game.get("bookmakers", []):
-            for mk in bm.get("markets", []):
-                if mk.get("key") == "h2h":
-                    mm = {o.get("name"): float(o.get("price")) for o in mk.get("outcomes", []) if o.get("name") and o.get("price") is not None}
-                    home_odds = mm.get(home)
-                    away_odds = mm.get(away)
-                    draw_odds = mm.get("Draw") or mm.get("Tie")
-                    break
-            if home_odds or away_odds or draw_odds:
-                break
-
-        rows.append({
-            "date": commence,
-            "home_team": home,
-            "away_team": away,
-            "home_odds_dec": home_odds,
-            "draw_odds_dec": draw_odds,
-            "away_odds_dec": away_odds
-        })
-
-    upc = pd.DataFrame(rows)
+        return empty_upcoming(f"Odds fetch failed for sport_key={sport_key}. Writing empty file to continue.")
+
+    # 4) Log every price to the odds history, then normalize: consensus over every bookmaker
+    #    (and any extra markets in ODDS_MARKETS)
+    prices = flatten_odds(data)
+    print(f"[INFO] odds history: {odds_history.append(prices)} new price points")
+    upc = normalize_odds(data, prices)
     if upc.empty:
-        write_empty_and_exit(f"No odds returned for sport_key={sport_key} in regions={REGIONS}. Writing empty file.")
-    upc["date"] = pd.to_datetime(upc["date"], errors="coerce").dt.tz_localize(None)
+        return empty_upcoming(f"No odds returned for sport_key={sport_key} in regions={REGIONS}. Writing empty file.")
+    upc["date"] = kickoff_times(upc["date"])
+    return upc
+
+# ---------- watch mode ----------
+# (hours to the nearest kickoff, seconds between polls); anything further out polls every 6 h
+POLL_SCHEDULE = [(1, 5 * 60), (6, 15 * 60), (24, 60 * 60), (48, 2 * 60 * 60)]
+POLL_MAX = 6 * 60 * 60
+MIN_REMAINING = int(os.environ.get("ODDS_MIN_REMAINING", "50"))     # never spend the last N requests
+QUOTA_RESET_DAY = int(os.environ.get("ODDS_QUOTA_RESET_DAY", "1"))  # day of month the quota renews (UTC)
+KEY_COLS = ["date","home_team","away_team"]
+
+def poll_interval(hours_to_kickoff: float) -> int:
+    for limit, secs in POLL_SCHEDULE:
+        if hours_to_kickoff <= limit:
+            return secs
+    return POLL_MAX
+
+def seconds_to_reset(now: pd.Timestamp) -> float:
+    reset = now.normalize().replace(day=1) + pd.DateOffset(days=QUOTA_RESET_DAY - 1)
+    if reset <= now:
+        reset = (now.normalize().replace(day=1) + pd.DateOffset(months=1)) + pd.DateOffset(days=QUOTA_RESET_DAY - 1)
+    return (reset - now).total_seconds()
+
+def budget_interval(cost: float, now: pd.Timestamp) -> float:
+    """Shortest interval that makes the remaining quota (less the reserve) last until it renews."""
+    if QUOTA["remaining"] is None or not cost:
+        return 0.0
+    usable = QUOTA["remaining"] - MIN_REMAINING
+    return float("inf") if usable < cost else seconds_to_reset(now) * cost / usable
+
+def load_snapshot() -> pd.DataFrame:
+    try:
+        df = pd.read_csv(OUT_UPCOMING, float_precision="round_trip")  # exact floats: rows are compared by hash
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        return pd.DataFrame(columns=UPCOMING_COLS)
+    df["date"] = kickoff_times(df["date"])
+    return df
+
+def merge_snapshot(old: pd.DataFrame, new: pd.DataFrame, now: pd.Timestamp):
+    """Upsert `new` into `old` by fixture; returns (merged, changed_keys, dropped_keys).
+
+    Fixtures missing from the feed are kept until kickoff so a partial response does not
+    wipe them; rows are compared by content hash, so untouched fixtures are not rewritten.
+    """
+    cols = list(dict.fromkeys(list(old.columns) + list(new.columns)))
+    old = old.reindex(columns=cols).set_index(KEY_COLS)
+    new = new.reindex(columns=cols).drop_duplicates(KEY_COLS, keep="last").set_index(KEY_COLS)
+    prev = row_hashes(old.reset_index()).set_axis(old.index)
+    cur = row_hashes(new.reset_index()).set_axis(new.index)
+    changed = cur.index[~cur.index.isin(prev.index) | (cur != prev.reindex(cur.index)).to_numpy()]
+    gone = old.index.difference(new.index)
+    dropped = gone[gone.get_level_values("date") < now]
+    kept = old.drop(index=dropped.union(new.index.intersection(old.index)))
+    merged = pd.concat([f for f in (kept, new) if len(f)]) if len(kept) or len(new) else new
+    return merged.reset_index().sort_values(KEY_COLS, kind="stable").reset_index(drop=True), changed, dropped
+
+def write_snapshot(df: pd.DataFrame):
+    tmp = OUT_UPCOMING + ".tmp"
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, OUT_UPCOMING)
+
+def watch(max_polls=None, sleep=time.sleep):
+    """Poll the odds feed until interrupted, tightening the interval as kickoff approaches.
+
+    The sport key and the last snapshot stay in memory between polls; the CSV is rewritten
+    only when a fixture's prices move, and odds_lines.csv whenever the odds history grows. Polling stops once the remaining quota would dip
+    below ODDS_MIN_REMAINING.
+    """
+    if not API_KEY:
+        print("[WARN] Missing THE_ODDS_API_KEY; nothing to watch.")
+        return
+    snapshot, sport_key, polls, last_used = load_snapshot(), None, 0, None
+    print(f"[INFO] Watching odds; {len(snapshot)} fixtures on disk")
+    while max_polls is None or polls < max_polls:
+        now = pd.Timestamp.now(tz="UTC").tz_localize(None)
+        if sport_key is None:
+            sport_key, err = resolve_sport_key(API_KEY)
+            if err:
+                print("[WARN]", err)
+        data = fetch_odds(API_KEY, sport_key, REGIONS, MARKETS) if sport_key else None
+        polls += 1
+        if data is None:
+            sport_key = None  # resolve again next time in case the key went stale
+        else:
+            prices = flatten_odds(data)
+            if odds_history.append(prices):  # new price points move the latest / closing lines
+                odds_history.fixture_lines().to_csv(odds_history.OUT_LINES, index=False)
+            upc = normalize_odds(data, prices)
+            upc["date"] = kickoff_times(upc["date"])
+            snapshot, changed, dropped = merge_snapshot(snapshot, upc, now)
+            if len(changed) or len(dropped):
+                write_snapshot(snapshot)
+                print(f"[OK] {len(changed)} fixtures changed, {len(dropped)} kicked off -> {OUT_UPCOMING}")
+            else:
+                print("[INFO] No price changes")
+
+        # cost of one poll: x-requests-last if sent, else the growth of x-requests-used
+        cost = QUOTA["last"] or (QUOTA["used"] - last_used if None not in (QUOTA["used"], last_used) else 0)
+        last_used = QUOTA["used"]
+        budget = budget_interval(cost, now)
+        if budget == float("inf"):
+            print(f"[WARN] Quota nearly spent ({QUOTA['remaining']:.0f} left, reserve {MIN_REMAINING}); stopping.")
+            return
+        upcoming = snapshot["date"][snapshot["date"] >= now]
+        hours = (upcoming.min() - now).total_seconds() / 3600 if len(upcoming) else float("inf")
+        wait = max(poll_interval(hours), budget)
+        if max_polls is not None and polls >= max_polls:
+            break
+        print(f"[INFO] quota remaining={QUOTA['remaining']} used={QUOTA['used']}; next poll in {wait / 60:.0f} min")
+        sleep(wait)
+
+def main():
+    ap = argparse.ArgumentParser(description="Fetch upcoming fixtures with bookmaker odds.")
+    ap.add_argument("--watch", action="store_true", help="keep polling and update the CSV as prices move")
+    ap.add_argument("--max-polls", type=int, help="stop watching after this many polls")
+    args = ap.parse_args()
+    if args.watch:
+        try:
+            watch(max_polls=args.max_polls)
+        except KeyboardInterrupt:
+            print("\n[INFO] Stopped watching.")
+        return
+    upc = fetch_upcoming()
     upc.to_csv(OUT_UPCOMING, index=False)
     print("Saved", OUT_UPCOMING, len(upc))
+    odds_history.fixture_lines().to_csv(odds_history.OUT_LINES, index=False)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,135 @@
+# scripts/history_store.py
+# Columnar store for the football-data.co.uk history, one partition per league and season:
+#
+#   data/history/league=E0/season=2425/<col>.npy    one array per column; text columns are
+#                                                   dictionary-encoded (<col>.codes.npy +
+#                                                   <col>.vocab.npy), nullable ints keep a
+#                                                   <col>.mask.npy next to their values
+#   data/history/league=E0/season=2425/meta.json    source hash, rows, date range, column kinds
+#
+# A partition is rewritten only when the hash of its normalized source rows changes, and a
+# league whose download fails keeps its stored rows. Rows are stored in date order, so read()
+# prunes partitions by league / season / date range from directory names and meta.json alone,
+# memory-maps just the requested columns and cuts the date range with a binary search.
+# raw_football_data.csv is still exported from the store by fetch_football_data.py.
+
+import os, json, glob, shutil, argparse
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from utils import frame_hash
+import schema
+
+STORE_DIR = os.path.join("data", "history")
+
+def partition_dir(league, season):
+    return os.path.join(STORE_DIR, f"league={league}", f"season={season}")
+
+def partitions():
+    """[(league, season, dir)] of every stored partition, sorted."""
+    out = []
+    for d in sorted(glob.glob(os.path.join(STORE_DIR, "league=*", "season=*"))):
+        if not d.endswith(".tmp") and os.path.exists(os.path.join(d, "meta.json")):
+            league = os.path.basename(os.path.dirname(d)).split("=", 1)[1]
+            out.append((league, os.path.basename(d).split("=", 1)[1], d))
+    return out
+
+def load_meta(d):
+    with open(os.path.join(d, "meta.json")) as f: return json.load(f)
+
+# ---------- write ----------
+def _save_column(d, c, s):
+    """One column -> .npy file(s); returns its kind for meta.json."""
+    if isinstance(s.dtype, pd.CategoricalDtype) or s.dtype == object or pd.api.types.is_string_dtype(s.dtype):
+        codes, vocab = pd.factorize(s.astype(object))
+        np.save(os.path.join(d, f"{c}.codes.npy"), codes.astype(np.int32))
+        np.save(os.path.join(d, f"{c}.vocab.npy"), vocab.astype(str).to_numpy(dtype=str))
+        return "text"
+    if pd.api.types.is_extension_array_dtype(s.dtype) and pd.api.types.is_integer_dtype(s.dtype):  # Int16 goals
+        np.save(os.path.join(d, f"{c}.npy"), s.to_numpy(dtype=s.dtype.numpy_dtype, na_value=0))
+        np.save(os.path.join(d, f"{c}.mask.npy"), s.isna().to_numpy())
+        return "masked"
+    np.save(os.path.join(d, f"{c}.npy"), s.to_numpy())
+    return "array"
+
+def write_partition(league, season, df) -> bool:
+    """Store the normalized rows of one league season; False when the stored copy is identical."""
+    df = df.sort_values("date", kind="stable").reset_index(drop=True)
+    source_hash = frame_hash(df)
+    d = partition_dir(league, season)
+    if os.path.exists(os.path.join(d, "meta.json")) and load_meta(d).get("source_hash") == source_hash:
+        return False
+    tmp = d + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    kinds = {c: _save_column(tmp, c, df[c]) for c in df.columns}
+    dates = df["date"].dropna()
+    meta = {"league": league, "season": season, "source_hash": source_hash, "rows": len(df),
+            "date_min": str(dates.min()) if len(dates) else None,
+            "date_max": str(dates.max()) if len(dates) else None, "columns": kinds}
+    with open(os.path.join(tmp, "meta.json"), "w") as f: json.dump(meta, f, indent=1)
+    shutil.rmtree(d, ignore_errors=True)
+    os.replace(tmp, d)
+    return True
+
+# ---------- read ----------
+def _load_column(d, c, kind, rows, mmap):
+    mode = "r" if mmap else None
+    if kind == "text":
+        codes = np.load(os.path.join(d, f"{c}.codes.npy"), mmap_mode=mode)[rows]
+        return pd.Categorical.from_codes(codes, np.load(os.path.join(d, f"{c}.vocab.npy")).astype(object))
+    values = np.load(os.path.join(d, f"{c}.npy"), mmap_mode=mode)[rows]
+    if kind == "array": return np.array(values)
+    mask = np.load(os.path.join(d, f"{c}.mask.npy"), mmap_mode=mode)[rows]
+    return pd.arrays.IntegerArray(np.array(values), np.array(mask))
+
+def read_partition(d, start=None, end=None, columns=None, mmap=True) -> pd.DataFrame:
+    """Rows of one partition with start <= date <= end (either bound optional)."""
+    meta = load_meta(d)
+    kinds = meta["columns"]
+    cols = [c for c in (columns or kinds) if c in kinds]
+    rows = slice(None)
+    if start is not None or end is not None:
+        dates = np.load(os.path.join(d, "date.npy"), mmap_mode="r" if mmap else None)
+        lo = np.searchsorted(dates, np.datetime64(pd.Timestamp(start)), "left") if start is not None else 0
+        hi = np.searchsorted(dates, np.datetime64(pd.Timestamp(end)), "right") if end is not None else len(dates)
+        rows = slice(lo, hi)
+    return pd.DataFrame({c: _load_column(d, c, kinds[c], rows, mmap) for c in cols})
+
+def read(leagues=None, seasons=None, start=None, end=None, columns=None, mmap=True) -> pd.DataFrame:
+    """Stored history, pruned by league / season / date range; teams come back categorical."""
+    frames = []
+    for league, season, d in partitions():
+        if (leagues is not None and league not in leagues) or (seasons is not None and season not in seasons):
+            continue
+        meta = load_meta(d)
+        if meta["date_max"] is None or (start is not None and pd.Timestamp(meta["date_max"]) < pd.Timestamp(start)) \
+                or (end is not None and pd.Timestamp(meta["date_min"]) > pd.Timestamp(end)):
+            continue
+        part = read_partition(d, start, end, columns, mmap)
+        if len(part): frames.append(part)
+    if not frames: return pd.DataFrame(columns=columns or [])
+    for c in schema.TEAM_COLS:  # one category set across partitions, so concat keeps the dtype
+        if all(c in f.columns for f in frames):
+            cats = union_categoricals([f[c].array for f in frames], sort_categories=True).categories
+            for f in frames: f[c] = f[c].cat.set_categories(cats)
+    df = pd.concat(frames, ignore_index=True)
+    return df.sort_values("date", kind="stable", ignore_index=True) if "date" in df.columns else df
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect the partitioned football-data history store.")
+    ap.add_argument("--league", action="append", help="only these leagues (repeatable)")
+    ap.add_argument("--season", action="append", help="only these seasons (repeatable)")
+    ap.add_argument("--start"); ap.add_argument("--end")
+    ap.add_argument("--export", help="write the selected rows to this CSV")
+    args = ap.parse_args()
+    for league, season, d in partitions():
+        m = load_meta(d)
+        print(f"{league:>4} {season}  {m['rows']:>6} rows  {m['date_min']} .. {m['date_max']}")
+    if args.export:
+        df = read(args.league, args.season, args.start, args.end)
+        df.to_csv(args.export, index=False)
+        print(f"[OK] exported {len(df)} rows -> {args.export}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# scripts/manifest.py
+# Content-addressed manifest of everything under data/ (data/.cache excluded):
+#
+#   data/.cache/manifest.json         path -> size, mtime_ns, sha1, producer (+ header, rows for CSVs)
+#   data/.cache/manifests/<name>.json  snapshots of the manifest (--snapshot)
+#   data/.cache/objects/ab/cdef...     file contents by sha1, written by --snapshot, read by --restore
+#
+# update() only stats files; a file is re-read (hash, header, row count in one pass) when its
+# size or mtime changed. The runner asks hashes() whether a stage's inputs changed and records
+# each stage as the producer of the files it wrote. A snapshot stores the manifest plus the
+# content of every file in it (deduplicated by hash); `--restore` puts every file it lists back
+# as it was (files created since are left alone).
+
+import os, json, time, shutil, hashlib, argparse
+from utils import csv_header
+
+DATA_DIR = "data"
+CACHE_DIR = os.path.join(DATA_DIR, ".cache")
+MANIFEST_PATH = os.path.join(CACHE_DIR, "manifest.json")
+SNAPSHOT_DIR = os.path.join(CACHE_DIR, "manifests")
+OBJECT_DIR = os.path.join(CACHE_DIR, "objects")
+
+def load(path=MANIFEST_PATH):
+    if not os.path.exists(path): return {}
+    with open(path) as f: return json.load(f)
+
+def save(entries, path=MANIFEST_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as f: json.dump(entries, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+def files(root=DATA_DIR):
+    """Paths relative to `root` of every file outside .cache (and outside *.tmp writes)."""
+    out = []
+    for d, dirs, names in os.walk(root):
+        dirs[:] = sorted(x for x in dirs if x != ".cache" and not x.endswith(".tmp"))
+        out += [os.path.relpath(os.path.join(d, n), root) for n in sorted(names) if not n.endswith(".tmp")]
+    return out
+
+def scan(path):
+    """sha1 and, for CSVs, header and data row count - one read of the file."""
+    h, lines, last = hashlib.sha1(), 0, b"\n"
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk); lines += chunk.count(b"\n"); last = chunk[-1:]
+    entry = {"sha1": h.hexdigest()}
+    if path.endswith(".csv"):
+        lines += last != b"\n"  # last line without a newline
+        entry.update(header=csv_header(path), rows=max(lines - 1, 0))
+    return entry
+
+def update(entries=None, paths=None, producer=None, root=DATA_DIR):
+    """Bring `entries` (default: the stored manifest) up to date and save it; returns it.
+
+    Only `paths` (relative to root) are looked at when given, otherwise every file under root.
+    `producer` is recorded for those paths.
+    """
+    entries = load() if entries is None else entries
+    rels = files(root) if paths is None else paths
+    if paths is None:  # full scan: forget deleted files
+        for gone in set(entries) - set(rels): del entries[gone]
+    for rel in rels:
+        path = os.path.join(root, rel)
+        if not os.path.exists(path):
+            entries.pop(rel, None); continue
+        st = os.stat(path)
+        e = entries.get(rel, {})
+        if e.get("size") != st.st_size or e.get("mtime_ns") != st.st_mtime_ns:
+            e = {k: v for k, v in e.items() if k == "producer"}
+            e.update(scan(path), size=st.st_size, mtime_ns=st.st_mtime_ns)
+        if producer: e["producer"] = producer
+        entries[rel] = e
+    save(entries)
+    return entries
+
+def hashes(paths, entries=None, root=DATA_DIR):
+    """{path: sha1 or None} for `paths`, rehashing only files whose size / mtime changed."""
+    entries = update(entries, list(paths), root=root)
+    return {p: entries.get(p, {}).get("sha1") for p in paths}
+
+# ---------- snapshots ----------
+def _object(sha1):
+    return os.path.join(OBJECT_DIR, sha1[:2], sha1[2:])
+
+def snapshot(name=None, root=DATA_DIR):
+    """Store the current manifest and the content of every file it lists; returns the snapshot path."""
+    entries = update(root=root)
+    stored = 0
+    for rel, e in entries.items():
+        obj = _object(e["sha1"])
+        if not os.path.exists(obj):
+            os.makedirs(os.path.dirname(obj), exist_ok=True)
+            shutil.copyfile(os.path.join(root, rel), obj + ".tmp")
+            os.replace(obj + ".tmp", obj)
+            stored += 1
+    path = os.path.join(SNAPSHOT_DIR, f"{name or time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}.json")
+    save(entries, path)
+    print(f"[OK] snapshot {path}: {len(entries)} files, {stored} new objects")
+    return path
+
+def restore(path, root=DATA_DIR):
+    """Make data/ match a snapshot: changed or missing files are copied back from objects/,
+    files the snapshot does not list are left alone. Returns the number of files restored."""
+    restored = 0
+    for rel, e in load(path).items():
+        target = os.path.join(root, rel)
+        if os.path.exists(target) and scan(target)["sha1"] == e["sha1"]: continue
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        shutil.copyfile(_object(e["sha1"]), target + ".tmp")
+        os.replace(target + ".tmp", target)
+        restored += 1
+    update(root=root)
+    print(f"[OK] restored {restored} files from {path}")
+    return restored
+
+def main():
+    ap = argparse.ArgumentParser(description="Manifest of the files under data/.")
+    ap.add_argument("--snapshot", nargs="?", const="", help="store a snapshot (optional name)")
+    ap.add_argument("--restore", help="restore data/ from a snapshot file")
+    args = ap.parse_args()
+    if args.restore: restore(args.restore); return
+    if args.snapshot is not None: snapshot(args.snapshot or None); return
+    for rel, e in sorted(update().items()):
+        rows = f"{e['rows']:>8} rows" if "rows" in e else " " * 13
+        print(f"{e['sha1'][:12]}  {e['size']:>10}  {rows}  {e.get('producer', '-'):<20} {rel}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# scripts/odds_history.py
+# Append-only log of every bookmaker price we have fetched, so line movement survives the
+# daily overwrite of raw_theodds_fixtures.csv.
+#
+#   data/odds_history/fetch_date=YYYY-MM-DD/part-<epoch>.npz   price points, one file per fetch
+#   data/odds_history/index.npz                               open / latest / close per
+#                                                             fixture x bookmaker x market x outcome x line
+#   data/odds_lines.csv                                       per-fixture consensus of the index
+#
+# Parts are columnar (compressed numpy arrays, no pickles) and only hold prices that moved
+# since the previous fetch. The index is folded forward from each new part, so lookups never
+# scan the log; `python scripts/odds_history.py --rebuild` recreates it from the parts.
+
+import os, glob, time, argparse
+import numpy as np
+import pandas as pd
+
+HISTORY_DIR = os.path.join("data", "odds_history")
+INDEX_PATH = os.path.join(HISTORY_DIR, "index.npz")
+OUT_LINES = os.path.join("data", "odds_lines.csv")
+
+KEY = ["commence","home_team","away_team","bookmaker","market","outcome","point"]
+POINT_COLS = KEY + ["fetched_at","price"]
+INDEX_COLS = KEY + ["open_price","open_at","latest_price","latest_at","close_price","close_at","n_points"]
+SIDES = ("home","draw","away")
+LINE_COLS = [f"{side}_odds_{stat}" for stat in ("open","latest","close") for side in SIDES]
+
+# ---------- storage ----------
+def _save(path, df, compress=True):
+    """Columns as numpy arrays; text columns dictionary-encoded (int32 codes + vocabulary)."""
+    arrays = {}
+    for c in df.columns:
+        if df[c].dtype == object:
+            codes, vocab = pd.factorize(df[c])
+            arrays[c + ".codes"], arrays[c + ".vocab"] = codes.astype(np.int32), vocab.to_numpy(dtype=str)
+        else:
+            arrays[c] = df[c].to_numpy()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "wb") as f: (np.savez_compressed if compress else np.savez)(f, **arrays)
+    os.replace(path + ".tmp", path)
+
+def _load(path, cols):
+    with np.load(path, allow_pickle=False) as z:
+        return pd.DataFrame({c: z[c] if c in z.files else z[c + ".vocab"].astype(object)[z[c + ".codes"]]
+                             for c in cols})
+
+def to_points(prices: pd.DataFrame, fetched_at: int) -> pd.DataFrame:
+    """fetch_the_odds_api.flatten_odds() output -> log rows (times as epoch seconds)."""
+    commence = pd.to_datetime(prices["commence_time"], errors="coerce", utc=True)
+    prices, commence = prices[commence.notna()], commence.dropna()
+    pts = pd.DataFrame({"commence": commence.astype("int64") // 10**9,
+                        "home_team": prices["home_team"].astype(str), "away_team": prices["away_team"].astype(str),
+                        "bookmaker": prices["bookmaker"].astype(str), "market": prices["market"].astype(str),
+                        "outcome": prices["outcome"].astype(str),
+                        "point": prices["point"].astype("float64").fillna(0.0),
+                        "fetched_at": np.int64(fetched_at), "price": prices["price"].astype("float64")})
+    return pts.reset_index(drop=True)
+
+def _summarize(df: pd.DataFrame) -> pd.DataFrame:
+    """Reduce index-shaped rows (or points cast to that shape) to one row per KEY.
+
+    One hash pass numbers the series, then a lexsort per timestamp column picks the
+    earliest open, the latest latest and the latest non-null close of each series.
+    """
+    code = df.groupby(KEY, sort=False).ngroup().to_numpy()
+    out = df.loc[~pd.Series(code).duplicated().to_numpy(), KEY].reset_index(drop=True)  # in code order
+    for stat, at_col, take_last in (("open", "open_at", False), ("latest", "latest_at", True),
+                                    ("close", "close_at", True)):
+        at = np.nan_to_num(df[at_col].to_numpy(dtype=float), nan=-np.inf)
+        order = np.lexsort((at, code))
+        c = code[order]
+        bounds = np.flatnonzero(np.r_[c[1:] != c[:-1], True]) if take_last else \
+            np.flatnonzero(np.r_[True, c[1:] != c[:-1]])
+        rows = order[bounds]
+        out[f"{stat}_price"] = df[f"{stat}_price"].to_numpy(dtype=float)[rows]
+        out[at_col] = df[at_col].to_numpy(dtype=float)[rows]
+    out["n_points"] = np.bincount(code, weights=df["n_points"].to_numpy(dtype=float)).astype(np.int64)
+    return out[INDEX_COLS]
+
+def _as_index_rows(pts: pd.DataFrame) -> pd.DataFrame:
+    at = pts["fetched_at"].astype("float64")
+    before = (pts["fetched_at"] <= pts["commence"]).to_numpy()
+    return pts[KEY].assign(open_price=pts["price"], open_at=at, latest_price=pts["price"], latest_at=at,
+                           close_price=pts["price"].where(before), close_at=at.where(before), n_points=1)
+
+def load_index() -> pd.DataFrame:
+    if not os.path.exists(INDEX_PATH):
+        return pd.DataFrame(columns=INDEX_COLS)
+    return _load(INDEX_PATH, INDEX_COLS)
+
+def append(prices: pd.DataFrame, fetched_at=None) -> int:
+    """Log the prices from one fetch; returns how many points were new or moved."""
+    if prices is None or prices.empty:
+        return 0
+    fetched_at = int(fetched_at if fetched_at is not None else time.time())
+    pts = to_points(prices, fetched_at).drop_duplicates(KEY, keep="last")
+    index = load_index()
+    if len(index):
+        last = index.set_index(KEY)["latest_price"]
+        prev = last.reindex(pd.MultiIndex.from_frame(pts[KEY])).to_numpy()
+        pts = pts[prev != pts["price"].to_numpy()]  # NaN (unseen key) never equals a price
+    if pts.empty:
+        return 0
+    day = pd.Timestamp(fetched_at, unit="s").strftime("%Y-%m-%d")
+    path, n = os.path.join(HISTORY_DIR, f"fetch_date={day}", f"part-{fetched_at}.npz"), 0
+    while os.path.exists(path):  # two fetches in the same second never overwrite each other
+        n += 1; path = os.path.join(HISTORY_DIR, f"fetch_date={day}", f"part-{fetched_at}-{n}.npz")
+    _save(path, pts)
+    rows = _as_index_rows(pts)
+    # the index is rewritten on every fetch, so it is stored uncompressed
+    _save(INDEX_PATH, _summarize(pd.concat([index, rows], ignore_index=True) if len(index) else rows), compress=False)
+    return len(pts)
+
+def read_log(start=None, end=None) -> pd.DataFrame:
+    """All logged points, optionally limited to fetch dates in [start, end] ("YYYY-MM-DD")."""
+    parts = []
+    for d in sorted(glob.glob(os.path.join(HISTORY_DIR, "fetch_date=*"))):
+        day = d.rsplit("=", 1)[1]
+        if (start and day < start) or (end and day > end): continue
+        parts += [_load(p, POINT_COLS) for p in sorted(glob.glob(os.path.join(d, "part-*.npz")))]
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=POINT_COLS)
+
+def rebuild_index() -> pd.DataFrame:
+    log = read_log()
+    index = _summarize(_as_index_rows(log)) if len(log) else pd.DataFrame(columns=INDEX_COLS)
+    _save(INDEX_PATH, index, compress=False)
+    return index
+
+# ---------- per-fixture lines ----------
+def fixture_lines(index=None) -> pd.DataFrame:
+    """Median over bookmakers of the opening, latest and closing h2h price per fixture.
+
+    `date` is the kick-off in naive UTC, as in raw_theodds_fixtures.csv; closing odds are the
+    last prices logged before kick-off (NaN if we never fetched that fixture pre-match).
+    """
+    index = load_index() if index is None else index
+    h2h = index[index["market"] == "h2h"]
+    if h2h.empty:
+        return pd.DataFrame(columns=["date","home_team","away_team"] + LINE_COLS)
+    med = h2h.groupby(["commence","home_team","away_team","outcome"])[
+        ["open_price","latest_price","close_price"]].median().unstack("outcome")
+    med = med.reindex(columns=pd.MultiIndex.from_product([["open_price","latest_price","close_price"], SIDES]))
+    med.columns = [f"{side}_odds_{stat.split('_')[0]}" for stat, side in med.columns]
+    out = med[LINE_COLS].reset_index()
+    out.insert(0, "date", pd.to_datetime(out.pop("commence"), unit="s"))
+    return out.sort_values("date", kind="stable").reset_index(drop=True)
+
+def main():
+    ap = argparse.ArgumentParser(description="Odds history: rebuild the index and export per-fixture lines.")
+    ap.add_argument("--rebuild", action="store_true", help="recreate the index from the logged parts")
+    args = ap.parse_args()
+    index = rebuild_index() if args.rebuild else load_index()
+    lines = fixture_lines(index)
+    lines.to_csv(OUT_LINES, index=False)
+    print(f"[OK] {len(index)} price series, {len(lines)} fixtures -> {OUT_LINES}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# scripts/remove_margin.py
+# Fair 1X2 probabilities from the bookmaker odds in HIST / UPCOMING, i.e. with the margin taken out.
+#
+#   {side}_fair_mult   multiplicative: implied / sum(implied)
+#   {side}_fair_add    additive: the overround is taken off each outcome in equal parts
+#   {side}_fair_power  power: implied ** k with k chosen so the outcomes sum to 1
+#   {side}_fair_shin   Shin (1993): margin explained by a share z of insider money (shin_z)
+#
+# plus `overround` (sum of implied probabilities - 1). Power and Shin are solved for all rows at
+# once with array iterations; rows with a missing or invalid price get NaN.
+
+import os
+import numpy as np
+import pandas as pd
+import schema
+
+HIST_PATH = "data/HIST_matches.csv"
+UPCOMING_PATH = "data/UPCOMING_fixtures.csv"
+
+SIDES = ("home","draw","away")
+ODDS_COLS = [f"{side}_odds_dec" for side in SIDES]
+METHODS = ("mult","add","power","shin")
+FAIR_COLS = [f"{side}_fair_{m}" for m in METHODS for side in SIDES] + ["overround","shin_z"]
+
+TOL = 1e-12
+MAX_ITER = 100
+
+def multiplicative(q):
+    return q / q.sum(axis=1, keepdims=True)
+
+def additive(q):
+    p = q - (q.sum(axis=1, keepdims=True) - 1.0) / q.shape[1]
+    p = np.clip(p, 0.0, None)  # a long shot can go negative under a big margin
+    return p / p.sum(axis=1, keepdims=True)
+
+def power(q):
+    """Solve sum(q ** k) = 1 per row by Newton's method.
+
+    f(k) = sum(q ** k) - 1 is convex and decreasing for 0 < q < 1, so Newton started at
+    k = 1 converges monotonically (no bracketing needed).
+    """
+    k = np.ones(len(q))
+    logq = np.log(q)
+    active = np.ones(len(q), dtype=bool)
+    for _ in range(MAX_ITER):
+        qk = q[active] ** k[active, None]
+        f = qk.sum(axis=1) - 1.0
+        step = f / (qk * logq[active]).sum(axis=1)
+        k[active] -= step
+        active[active] = np.abs(step) > TOL  # NaN (degenerate row) also stops
+        if not active.any(): break
+    return q ** k[:, None]
+
+def shin_probs(q, z):
+    a = q**2 / q.sum(axis=1, keepdims=True)
+    z = z[:, None]
+    return (np.sqrt(z**2 + 4.0 * (1.0 - z) * a) - z) / (2.0 * (1.0 - z))
+
+def shin(q):
+    """Shin's z per row from sum(p(z)) = 1 by safeguarded Newton; returns (p, z).
+
+    The sum decreases in z and is sqrt(sum(q)) > 1 at z = 0, so the root is bracketed by
+    [0, 1); a Newton step that leaves the current bracket is replaced by a bisection step.
+    """
+    n = len(q)
+    z, lo, hi = np.zeros(n), np.zeros(n), np.ones(n)
+    a = q**2 / q.sum(axis=1, keepdims=True)
+    active = np.arange(n)
+    for _ in range(MAX_ITER):
+        za, aa = z[active, None], a[active]
+        r = np.sqrt(za**2 + 4.0 * (1.0 - za) * aa)
+        g = ((r - za) / (2.0 * (1.0 - za))).sum(axis=1) - 1.0
+        dr = (za - 2.0 * aa) / r
+        dg = (((dr - 1.0) * (1.0 - za) + (r - za)) / (2.0 * (1.0 - za)**2)).sum(axis=1)
+        over = g > 0
+        lo[active] = np.where(over, za[:, 0], lo[active])
+        hi[active] = np.where(over, hi[active], za[:, 0])
+        new = za[:, 0] - g / dg
+        bad = ~((new > lo[active]) & (new < hi[active]))
+        new[bad] = 0.5 * (lo[active] + hi[active])[bad]
+        done = np.abs(new - za[:, 0]) <= TOL
+        z[active] = new
+        active = active[~done]
+        if not len(active): break
+    p = shin_probs(q, z)
+    return p / p.sum(axis=1, keepdims=True), z
+
+def fair_probs(odds: np.ndarray) -> pd.DataFrame:
+    """(n, 3) decimal odds -> FAIR_COLS; rows with a price <= 1 or missing, or no margin, are NaN."""
+    odds = np.asarray(odds, dtype=float)
+    ok = np.isfinite(odds).all(axis=1) & (odds > 1.0).all(axis=1)
+    q = 1.0 / odds[ok]
+    margin = q.sum(axis=1) > 1.0  # Shin/power assume a positive overround
+    ok[ok], q = margin, q[margin]
+    out = np.full((len(odds), len(FAIR_COLS)), np.nan)
+    shin_p, z = shin(q)
+    for i, p in enumerate((multiplicative(q), additive(q), power(q), shin_p)):
+        out[ok, 3 * i:3 * i + 3] = p
+    out[ok, -2] = q.sum(axis=1) - 1.0
+    out[ok, -1] = z
+    return pd.DataFrame(out, columns=FAIR_COLS)
+
+def add_fair_probs(df: pd.DataFrame) -> pd.DataFrame:
+    """Return `df` with FAIR_COLS (re)computed from its *_odds_dec columns."""
+    df = df.reset_index(drop=True)  # a new frame; existing FAIR_COLS keep their position
+    if df.empty or not set(ODDS_COLS).issubset(df.columns):
+        df[FAIR_COLS] = np.nan
+        return df
+    df[FAIR_COLS] = fair_probs(df[ODDS_COLS].apply(pd.to_numeric, errors="coerce").to_numpy()).to_numpy()
+    return df
+
+def main():
+    for path in (HIST_PATH, UPCOMING_PATH):
+        if not os.path.exists(path):
+            print(f"[WARN] {path} missing; run build_hist_and_upcoming.py first")
+            continue
+        df = add_fair_probs(schema.read(path))
+        df.to_csv(path, index=False)
+        print(f"[OK] fair probabilities -> {path} ({df['overround'].notna().sum()}/{len(df)} rows priced)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+# scripts/run_pipeline.py
+# Run the whole pipeline in one interpreter. Stages form a DAG over named datasets and hand
+# DataFrames to each other in memory; each declared output is written to CSV once, by the last
+# stage in the run that produces it (HIST/UPCOMING pass through several stages in memory), or
+# at the end of the run if that stage was skipped.
+#
+#   python scripts/run_pipeline.py                 # everything
+#   python scripts/run_pipeline.py --from enrich   # enrich and every stage after it
+#   python scripts/run_pipeline.py --only build,validate
+#   python scripts/run_pipeline.py --force         # ignore the input-hash skip check
+#
+# A stage with inputs is skipped when its key - the version of each input plus the stage's
+# settings (env knobs) - matches the last run and its outputs are on disk; its outputs are then
+# read back lazily if a later stage needs them. A dataset's version is the hash of its CSV as
+# written, or, for an intermediate that is never written, "<stage>:<key>" of the stage that
+# produced it, so a chain of stages skips as a whole when the head of the chain does. Keys are
+# stored only once every dataset the stage produced is on disk.
+# File hashes come from the data/ manifest (manifest.py), which re-reads a file only when its
+# size or mtime changed and records which stage produced it; `--snapshot` stores the data/
+# state a run ended with, for `manifest.py --restore`.
+
+import os, sys, json, time, hashlib, argparse
+import pandas as pd
+
+import fetch_football_data, fetch_the_odds_api, fetch_fbr_team_xg, bootstrap_team_priors
+import ensure_min_files, enrich_features, build_hist_and_upcoming, validate_data, odds_history
+import remove_margin, score_model, team_ratings, team_form, team_names, schema, manifest
+
+DATA_DIR = "data"
+STATE_PATH = os.path.join(DATA_DIR, ".cache", "runner_state.json")
+
+class Stage:
+    """`lazy` stages get the Datasets themselves instead of their inputs read up front;
+    `on_skip` runs when the stage is skipped; `settings` (JSON-able) are part of the skip key."""
+    def __init__(self, name, fn, inputs=(), outputs=(), lazy=False, on_skip=None, settings=None):
+        self.name, self.fn, self.inputs, self.outputs, self.lazy = name, fn, list(inputs), list(outputs), lazy
+        self.on_skip, self.settings = on_skip, settings
+
+def _enrich(d):
+    out = enrich_features.enrich_all(
+        {"raw_football_data.csv": d["raw_football_data"], "raw_theodds_fixtures.csv": d["raw_theodds_fixtures"]},
+        d["teams_master"], d["stadiums"], d["ref_baselines"], d["injuries"], d["lineups"],
+        d["xg_metrics_hybrid"], enrich_features.load_name_map(),
+        d["odds_lines"])
+    return {"enriched_football_data": out["enriched_football_data.csv"],
+            "enriched_theodds_fixtures": out["enriched_theodds_fixtures.csv"]}
+
+def _build(d):
+    hist, upc = build_hist_and_upcoming.build(d["enriched_football_data"], d["enriched_theodds_fixtures"])
+    build_hist_and_upcoming.write_deltas(hist, upc)  # against the previous files, before they are overwritten
+    return {"HIST_matches": hist, "UPCOMING_fixtures": upc}
+
+def _score_model(d):
+    rates = score_model.goal_rates(d["HIST_matches"])
+    return {n: score_model.add_model_probs(d[n], d["xg_metrics_hybrid"], rates)
+            for n in ("HIST_matches","UPCOMING_fixtures")}
+
+def _validate(d):
+    # only frames already in memory are passed; the rest are checked from disk, header-only where possible
+    validate_data.validate({f"{k}.csv": v for k, v in d.items()})
+    return {}
+
+# In dependency order. Dataset names are file stems under data/.
+STAGES = [
+    Stage("fetch_football_data", lambda d: {"raw_football_data": fetch_football_data.fetch_history()},
+          outputs=["raw_football_data"]),
+    Stage("fetch_odds", lambda d: {"raw_theodds_fixtures": fetch_the_odds_api.fetch_upcoming(),
+                                   "odds_lines": odds_history.fixture_lines()},
+          outputs=["raw_theodds_fixtures","odds_lines"]),
+    Stage("fetch_fbr_xg", lambda d: dict(zip(["xg_metrics_current","xg_metrics_last","xg_metrics_hybrid"],
+                                             fetch_fbr_team_xg.fetch_xg())),
+          outputs=["xg_metrics_current","xg_metrics_last","xg_metrics_hybrid"]),
+    Stage("bootstrap_priors", lambda d: {"teams_master": bootstrap_team_priors.build_priors(d["xg_metrics_hybrid"])},
+          inputs=["xg_metrics_hybrid"], outputs=["teams_master"]),
+    Stage("ensure_min_files", lambda d: ensure_min_files.main() or {}),
+    Stage("enrich", _enrich,
+          inputs=["raw_football_data","raw_theodds_fixtures","teams_master","stadiums","ref_baselines",
+                  "injuries","lineups","xg_metrics_hybrid","team_name_map","odds_lines"],
+          outputs=["enriched_football_data","enriched_theodds_fixtures"],
+          settings={"version": enrich_features.ENRICH_VERSION, "staleness": enrich_features.STALENESS_DAYS,
+                    "full": enrich_features.ENRICH_FULL, "fuzzy": [team_names.FUZZY, team_names.FUZZY_CUTOFF]}),
+    Stage("build", _build, inputs=["enriched_football_data","enriched_theodds_fixtures"],
+          outputs=["HIST_matches","UPCOMING_fixtures"], on_skip=build_hist_and_upcoming.write_empty_deltas),
+    Stage("team_ratings", lambda d: dict(zip(["HIST_matches","UPCOMING_fixtures"],
+                                             team_ratings.add_ratings(d["HIST_matches"], d["UPCOMING_fixtures"]))),
+          inputs=["HIST_matches","UPCOMING_fixtures"], outputs=["HIST_matches","UPCOMING_fixtures"],
+          settings=team_ratings.SETTINGS),
+    Stage("team_form", lambda d: dict(zip(["HIST_matches","UPCOMING_fixtures"],
+                                          team_form.add_form(d["HIST_matches"], d["UPCOMING_fixtures"]))),
+          inputs=["HIST_matches","UPCOMING_fixtures"], outputs=["HIST_matches","UPCOMING_fixtures"]),
+    Stage("remove_margin", lambda d: {n: remove_margin.add_fair_probs(d[n]) for n in ("HIST_matches","UPCOMING_fixtures")},
+          inputs=["HIST_matches","UPCOMING_fixtures"], outputs=["HIST_matches","UPCOMING_fixtures"]),
+    Stage("score_model", _score_model, inputs=["HIST_matches","UPCOMING_fixtures","xg_metrics_hybrid"],
+          outputs=["HIST_matches","UPCOMING_fixtures"],
+          settings={"max_goals": score_model.MAX_GOALS, "rho": score_model.DC_RHO}),
+    Stage("validate", _validate,
+          inputs=["enriched_football_data","enriched_theodds_fixtures","HIST_matches","UPCOMING_fixtures",
+                  "xg_metrics_current","xg_metrics_last","xg_metrics_hybrid"], lazy=True),
+]
+
+def csv_path(name):
+    return os.path.join(DATA_DIR, f"{name}.csv")
+
+class Datasets(dict):
+    """In-memory datasets; anything not produced in this run is read from data/ on first use."""
+    def __missing__(self, name):
+        path = csv_path(name)
+        df = schema.read(path)
+        self[name] = df
+        return df
+
+def select(stages, only=None, start=None):
+    names = [s.name for s in stages]
+    for n in (only or []) + ([start] if start else []):
+        if n not in names: sys.exit(f"Unknown stage {n!r}; stages are: {', '.join(names)}")
+    if only: return [s for s in stages if s.name in only]
+    if start: return stages[names.index(start):]
+    return stages
+
+def stage_key(st, versions):
+    """{input: version} plus the stage's settings. Inputs without a version from this run are
+    versioned by the hash of their CSV as written, so in-memory dtypes do not affect the check."""
+    unseen = [n for n in st.inputs if n not in versions]
+    if unseen:
+        hashes = manifest.hashes([f"{n}.csv" for n in unseen])
+        versions.update({n: hashes[f"{n}.csv"] for n in unseen})
+    key = {n: versions[n] for n in st.inputs}
+    if st.settings is not None: key["_settings"] = json.dumps(st.settings, sort_keys=True)
+    return key
+
+def lineage(st, key):
+    """Version of a dataset `st` produced but did not write: which stage, from which inputs."""
+    return f"{st.name}:" + hashlib.sha1(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def load_state():
+    if not os.path.exists(STATE_PATH): return {}
+    with open(STATE_PATH) as f: return json.load(f)
+
+def save_state(state):
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    with open(STATE_PATH + ".tmp", "w") as f: json.dump(state, f, indent=1)
+    os.replace(STATE_PATH + ".tmp", STATE_PATH)
+
+def write(data, names, versions, unwritten, producer):
+    """Write `names` to CSV; their version becomes the hash of the file."""
+    for name in names:
+        data[name].to_csv(csv_path(name), index=False)
+        entries = manifest.update(paths=[f"{name}.csv"], producer=producer[name])
+        versions[name] = entries[f"{name}.csv"]["sha1"]
+        unwritten.discard(name)
+
+def run(stages, force=False, snapshot=None):
+    state = load_state()
+    data = Datasets()
+    writer = {o: st.name for st in stages for o in st.outputs}  # last stage producing each dataset
+    versions, unwritten, pending, producer = {}, set(), {}, {}
+    for st in stages:
+        t0 = time.perf_counter()
+        key = stage_key(st, versions)
+        final = [o for o in st.outputs if writer[o] == st.name]
+        if (not force and st.inputs and st.outputs and state.get(st.name) == key
+                and all(os.path.exists(csv_path(o)) for o in st.outputs)):
+            print(f"[SKIP] {st.name}: inputs unchanged")
+            if st.on_skip: st.on_skip()
+            for name in st.outputs:
+                if name in final: versions.pop(name, None)  # the CSV on disk is current
+                else: versions[name] = lineage(st, key)
+            continue
+        print(f"[RUN] {st.name}")
+        outputs = st.fn(dict(data) if st.lazy else {n: data[n] for n in st.inputs})
+        for name in st.outputs:
+            if outputs[name] is None: continue  # nothing to write (e.g. a raw file that is not there)
+            data[name], versions[name], producer[name] = outputs[name], lineage(st, key), st.name
+            unwritten.add(name)
+        write(data, [n for n in final if n in unwritten], versions, unwritten, producer)
+        if st.inputs: pending[st.name] = key
+        if pending and not unwritten:  # a key is only valid once what its stage produced is on disk
+            state.update(pending); pending = {}
+            save_state(state)
+        print(f"[OK] {st.name} ({time.perf_counter() - t0:.2f}s)")
+    if unwritten:  # produced by a stage whose later producers were all skipped
+        write(data, sorted(unwritten), versions, unwritten, producer)
+        state.update(pending)
+        save_state(state)
+    manifest.update()  # side files (history partitions, deltas, reports) and deletions
+    if snapshot is not None: manifest.snapshot(snapshot or None)
+
+def main():
+    ap = argparse.ArgumentParser(description="Run pipeline stages in one process.")
+    ap.add_argument("--only", help="comma-separated stage names to run")
+    ap.add_argument("--from", dest="start", help="run this stage and every stage after it")
+    ap.add_argument("--force", action="store_true", help="run stages even if their inputs are unchanged")
+    ap.add_argument("--snapshot", nargs="?", const="", help="snapshot data/ after the run (optional name)")
+    args = ap.parse_args()
+    only = [s.strip() for s in args.only.split(",")] if args.only else None
+    os.makedirs(DATA_DIR, exist_ok=True)
+    run(select(STAGES, only, args.start), force=args.force, snapshot=args.snapshot)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# scripts/schema.py
+# Column types for the tables the pipeline passes around, applied once when a table is loaded:
+#   teams    category; share_teams() gives every frame of a run one CategoricalDtype, so team
+#            columns are integer codes that agree across frames
+#   ratings  float32 (gk / set-piece / crowd / injury indices, referee penalty rate)
+#   flags    int8, missing -> 0 (lineup flags)
+#   dates    datetime64, tz-naive, parsed here and nowhere else
+#   ids      str (match_id, src_hash are hex digests; an all-digit one must keep its leading zeros)
+# Columns a schema does not mention keep pandas' default types (odds and xG stay float64).
+
+import os
+import numpy as np
+import pandas as pd
+
+TEAM, DATE, RATING, FLAG, ID = "team", "date", "float32", "int8", "str"
+TEAM_COLS = ("team", "home_team", "away_team")
+LINEUP_FLAGS = ("key_att_out", "key_def_out", "keeper_changed")
+
+FIXTURES = {"date": DATE, "home_team": TEAM, "away_team": TEAM}
+ENRICHED = dict(FIXTURES, match_id=ID, src_hash=ID, crowd_index=RATING, ref_pen_rate=RATING,
+                **{f"{side}_{c}": RATING for side in ("home","away")
+                   for c in ("gk_rating","setpiece_rating","injury_index")},
+                **{f"{side}_{f}": FLAG for side in ("home","away") for f in LINEUP_FLAGS})
+TEAM_TABLE = {"team": TEAM}
+
+# table name (file stem under data/) -> column types
+SCHEMAS = {
+    "teams_master": dict(TEAM_TABLE, gk_rating=RATING, setpiece_rating=RATING, crowd_index=RATING),
+    "stadiums": TEAM_TABLE,
+    "ref_baselines": {"ref_pen_rate": RATING},
+    "injuries": dict(TEAM_TABLE, date=DATE, injury_index=RATING),
+    "lineups": dict(TEAM_TABLE, date=DATE, **{f: FLAG for f in LINEUP_FLAGS}),
+    "xg_metrics_current": TEAM_TABLE,
+    "xg_metrics_last": TEAM_TABLE,
+    "xg_metrics_hybrid": TEAM_TABLE,
+    "raw_football_data": FIXTURES,
+    "raw_theodds_fixtures": FIXTURES,
+    "odds_lines": FIXTURES,
+    "enriched_football_data": ENRICHED,
+    "enriched_theodds_fixtures": ENRICHED,
+    "HIST_matches": ENRICHED,
+    "UPCOMING_fixtures": ENRICHED,
+}
+
+def table_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+def to_dates(s):
+    """Naive datetime64 column; a no-op for columns that already are one."""
+    if pd.api.types.is_datetime64_any_dtype(s) and getattr(s.dt, "tz", None) is None:
+        return s
+    d = pd.to_datetime(s, errors="coerce")
+    return d.dt.tz_localize(None) if getattr(d.dt, "tz", None) is not None else d
+
+def coerce(df, name):
+    """Apply SCHEMAS[name] to an in-memory frame (columns it lacks are left alone)."""
+    for c, t in SCHEMAS.get(name, {}).items():
+        if c not in df.columns: continue
+        s = df[c]
+        if t == DATE: df[c] = to_dates(s)
+        elif t == TEAM:
+            if not isinstance(s.dtype, pd.CategoricalDtype): df[c] = s.astype("category")
+        elif t == ID:
+            if s.dtype != object: df[c] = s.astype(object).where(s.isna(), s.astype(str))
+        elif t == FLAG: df[c] = pd.to_numeric(s, errors="coerce").fillna(0).astype(FLAG)
+        elif s.dtype != t: df[c] = pd.to_numeric(s, errors="coerce").astype(t)
+    return df
+
+def read(path, name=None, **kw):
+    """Read a CSV straight into its table's schema; empty frame when missing or empty.
+
+    Floats are parsed round-trip exact: stages compare rows by hash across runs.
+    """
+    if not os.path.exists(path): return pd.DataFrame()
+    kw.setdefault("float_precision", "round_trip")
+    name = name or table_name(path)
+    types = SCHEMAS.get(name, {})
+    try:
+        header = pd.read_csv(path, nrows=0).columns
+        dtype = {c: "category" if t == TEAM else str for c, t in types.items() if t in (TEAM, ID) and c in header}
+        df = pd.read_csv(path, dtype=dtype, **kw)
+    except pd.errors.EmptyDataError:
+        return pd.DataFrame()
+    return coerce(df, name)
+
+def share_teams(*frames):
+    """Recast every team column of `frames` to one CategoricalDtype (sorted union of names).
+
+    Works in place; returns the dtype. Sorted categories keep sort_values on a team column
+    in name order.
+    """
+    cols = [(df, c) for df in frames if df is not None for c in TEAM_COLS if c in df.columns]
+    names = set()
+    for df, c in cols:
+        s = df[c]
+        names.update(s.cat.categories if isinstance(s.dtype, pd.CategoricalDtype) else s.dropna().unique())
+    dtype = pd.CategoricalDtype(sorted(map(str, names)))
+    for df, c in cols:
+        s = df[c]
+        if not isinstance(s.dtype, pd.CategoricalDtype): s = s.astype("string").astype(object)
+        df[c] = s.astype(dtype)
+    return dtype
+
+def team_codes(index, teams):
+    """index.get_indexer(teams) (-1 = not found); a categorical column is looked up once per
+    category and broadcast through its codes."""
+    if isinstance(teams.dtype, pd.CategoricalDtype):
+        lookup = np.r_[index.get_indexer(teams.cat.categories.astype(str)), -1]
+        return lookup[teams.cat.codes.to_numpy()]  # NaN has code -1 -> the trailing -1
+    return index.get_indexer(teams.astype(str))
@@ -0,0 +1,107 @@
+# scripts/score_model.py
+# Independent-Poisson scoreline model from the hybrid xG rates (optionally Dixon-Coles corrected).
+#
+#   lambda_home = home_goal_rate * attack(home) * defence(away)
+#   lambda_away = away_goal_rate * attack(away) * defence(home)
+#
+# attack = team xG / league-table mean xG, defence = team xGA / mean xGA (both from
+# xg_metrics_hybrid.csv); the goal rates are the HIST averages. Every fixture gets a
+# 0..SCORE_MAX_GOALS x 0..SCORE_MAX_GOALS scoreline grid, built for all rows at once by
+# broadcasting, and is reduced to 1X2, over/under and both-teams-to-score probabilities.
+
+import os
+import numpy as np
+import pandas as pd
+import schema
+
+HIST_PATH = "data/HIST_matches.csv"
+UPCOMING_PATH = "data/UPCOMING_fixtures.csv"
+XG_PATH = "data/xg_metrics_hybrid.csv"
+
+MAX_GOALS = int(os.environ.get("SCORE_MAX_GOALS", "10"))
+# Dixon-Coles low-score dependence; 0 = plain Poisson (fitted values are typically around -0.1)
+DC_RHO = float(os.environ.get("DIXON_COLES_RHO", "0"))
+TOTAL_LINES = (1.5, 2.5, 3.5)
+DEFAULT_RATES = (1.5, 1.2)  # home / away goals per match when HIST has no results
+CHUNK = 50_000  # rows per grid batch (each row is a (MAX_GOALS + 1)^2 float64 grid)
+
+def _line(x): return str(x).replace(".", "_")
+MODEL_COLS = (["model_lambda_home","model_lambda_away","model_home","model_draw","model_away"]
+              + [f"model_{s}_{_line(l)}" for l in TOTAL_LINES for s in ("over","under")] + ["model_btts"])
+
+def goal_rates(hist) -> tuple:
+    if hist is None or hist.empty or not {"home_goals","away_goals"}.issubset(hist.columns):
+        return DEFAULT_RATES
+    h, a = pd.to_numeric(hist["home_goals"], errors="coerce"), pd.to_numeric(hist["away_goals"], errors="coerce")
+    ok = h.notna() & a.notna()
+    return (h[ok].mean(), a[ok].mean()) if ok.any() else DEFAULT_RATES
+
+def expected_goals(df, xg, rates) -> tuple:
+    """(lambda_home, lambda_away) arrays; NaN where a side has no xG."""
+    col = lambda frame, c: pd.to_numeric(frame[c], errors="coerce") if c in frame.columns \
+        else pd.Series(np.nan, index=frame.index)
+    xg = xg if xg is not None else pd.DataFrame()
+    mean_xg, mean_xga = col(xg, "xg_hybrid").mean(), col(xg, "xga_hybrid").mean()
+    if not (mean_xg > 0 and mean_xga > 0):
+        # no table to compare against: fall back to the fixtures' own averages
+        mean_xg = pd.concat([col(df, "home_xg"), col(df, "away_xg")]).mean()
+        mean_xga = pd.concat([col(df, "home_xga"), col(df, "away_xga")]).mean()
+    att_h, att_a = (col(df, f"{s}_xg").to_numpy(dtype=float) / mean_xg for s in ("home","away"))
+    def_h, def_a = (col(df, f"{s}_xga").to_numpy(dtype=float) / mean_xga for s in ("home","away"))
+    return rates[0] * att_h * def_a, rates[1] * att_a * def_h
+
+def poisson_pmf(lam, max_goals):
+    """(n,) rates -> (n, max_goals + 1) probabilities of 0..max_goals goals."""
+    k = np.arange(max_goals + 1)
+    log_fact = np.r_[0.0, np.cumsum(np.log(k[1:]))]
+    lam = lam[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.exp(k * np.log(lam) - lam - log_fact)
+
+def score_grids(lam_h, lam_a, max_goals=MAX_GOALS, rho=DC_RHO):
+    """(n, G, G) scoreline probabilities, grid[r, i, j] = P(home i, away j), renormalised to 1."""
+    grid = poisson_pmf(lam_h, max_goals)[:, :, None] * poisson_pmf(lam_a, max_goals)[:, None, :]
+    if rho:
+        grid[:, 0, 0] *= 1.0 - lam_h * lam_a * rho
+        grid[:, 0, 1] *= 1.0 + lam_h * rho
+        grid[:, 1, 0] *= 1.0 + lam_a * rho
+        grid[:, 1, 1] *= 1.0 - rho
+    return grid / grid.sum(axis=(1, 2), keepdims=True)
+
+def market_masks(max_goals=MAX_GOALS) -> np.ndarray:
+    """(G*G, markets) 0/1 matrix so one matmul turns flattened grids into MODEL_COLS[2:]."""
+    i, j = np.indices((max_goals + 1, max_goals + 1))
+    masks = [i > j, i == j, i < j]
+    for line in TOTAL_LINES:
+        masks += [i + j > line, i + j < line]
+    masks.append((i > 0) & (j > 0))
+    return np.stack([m.ravel() for m in masks], axis=1).astype(float)
+
+def market_probs(lam_h, lam_a, max_goals=MAX_GOALS, rho=DC_RHO) -> np.ndarray:
+    masks = market_masks(max_goals)
+    out = np.full((len(lam_h), masks.shape[1]), np.nan)
+    ok = np.flatnonzero(np.isfinite(lam_h) & np.isfinite(lam_a) & (lam_h > 0) & (lam_a > 0))
+    for start in range(0, len(ok), CHUNK):
+        rows = ok[start:start + CHUNK]
+        grid = score_grids(lam_h[rows], lam_a[rows], max_goals, rho)
+        out[rows] = grid.reshape(len(rows), -1) @ masks
+    return out
+
+def add_model_probs(df, xg, rates) -> pd.DataFrame:
+    """Return `df` with MODEL_COLS (re)computed."""
+    df = df.reset_index(drop=True)  # a new frame; existing MODEL_COLS keep their position
+    lam_h, lam_a = expected_goals(df, xg, rates)
+    df[MODEL_COLS] = np.column_stack([lam_h, lam_a, market_probs(lam_h, lam_a)])
+    return df
+
+def main():
+    xg = schema.read(XG_PATH)
+    frames = {p: schema.read(p) for p in (HIST_PATH, UPCOMING_PATH) if os.path.exists(p)}
+    rates = goal_rates(frames.get(HIST_PATH))
+    for path, df in frames.items():
+        df = add_model_probs(df, xg, rates)
+        df.to_csv(path, index=False)
+        print(f"[OK] scoreline model -> {path} ({df['model_home'].notna().sum()}/{len(df)} rows with xG)")
+
+if __name__ == "__main__":
+    main()
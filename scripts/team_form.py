@@ -0,0 +1,212 @@
+# scripts/team_form.py
+# Rolling form over each team's last 5 / 10 matches, added point-in-time to HIST and as of now
+# to UPCOMING:
+#   {side}_form_gf_{w}, {side}_form_ga_{w}   goals for / against per match
+#   {side}_form_pts_{w}                      points per match
+#   {side}_form_overperf_{w}                 points minus the points the closing odds expected
+#
+# State is a ring buffer of the last max(FORM_WINDOWS) appearances per team, checkpointed in
+# data/.cache/form_state.npz together with the features of every processed match, so a daily
+# run costs O(new matches). `--verify` recomputes everything with a groupby/rolling pass and compares.
+
+import os, json, argparse
+import numpy as np
+import pandas as pd
+from utils import frame_hash, match_ids
+from remove_margin import multiplicative
+import schema
+
+HIST_PATH = "data/HIST_matches.csv"
+UPCOMING_PATH = "data/UPCOMING_fixtures.csv"
+STATE_PATH = os.path.join("data", ".cache", "form_state.npz")
+
+FORM_WINDOWS = (5, 10)
+STATS = ("gf","ga","pts","overperf")
+INPUT_COLS = ["date","home_team","away_team","home_goals","away_goals","home_odds_dec","draw_odds_dec","away_odds_dec"]
+FEATURES = [f"form_{s}_{w}" for w in FORM_WINDOWS for s in STATS]
+FORM_COLS = [f"{side}_{f}" for side in ("home","away") for f in FEATURES]
+
+# ---------- inputs ----------
+def results(hist):
+    """Settled matches in replay order with a match_id (odds may be missing)."""
+    df = hist.reindex(columns=INPUT_COLS).copy()
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    for c in INPUT_COLS[3:]: df[c] = pd.to_numeric(df[c], errors="coerce")
+    df = df.dropna(subset=INPUT_COLS[:5]).sort_values(["date","home_team","away_team"], kind="stable")
+    df.insert(0, "match_id", match_ids(df["date"], df["home_team"], df["away_team"]))
+    return df.drop_duplicates("match_id", keep="last").reset_index(drop=True)
+
+def appearances(df):
+    """One row per team per match, in match order: (match row, side, team, day, *STATS)."""
+    gh, ga = df["home_goals"].to_numpy(float), df["away_goals"].to_numpy(float)
+    odds = df[["home_odds_dec","draw_odds_dec","away_odds_dec"]].to_numpy(float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = multiplicative(1.0 / np.where(odds > 1.0, odds, np.nan))
+    pts_h = np.where(gh > ga, 3.0, np.where(gh == ga, 1.0, 0.0))
+    pts_a = np.where(ga > gh, 3.0, np.where(gh == ga, 1.0, 0.0))
+    xpts_h, xpts_a = 3 * p[:, 0] + p[:, 1], 3 * p[:, 2] + p[:, 1]
+    n = len(df)
+    long = pd.DataFrame({
+        "row": np.r_[np.arange(n), np.arange(n)], "side": np.repeat(["home","away"], n),
+        "team": np.r_[df["home_team"].to_numpy(object), df["away_team"].to_numpy(object)],
+        "day": np.r_[df["date"].to_numpy("datetime64[D]"), df["date"].to_numpy("datetime64[D]")],
+        "gf": np.r_[gh, ga], "ga": np.r_[ga, gh], "pts": np.r_[pts_h, pts_a],
+        "overperf": np.r_[pts_h - xpts_h, pts_a - xpts_a]})
+    return long.sort_values(["row","side"], ascending=[True, False], kind="stable").reset_index(drop=True)
+
+# ---------- ring buffer ----------
+class FormState:
+    """Last `size` appearances per team: buf[team, slot, stat], `count` appearances so far."""
+    def __init__(self, teams=None, buf=None, count=None, size=max(FORM_WINDOWS)):
+        self.teams = pd.Index([] if teams is None else teams, dtype=object)
+        self.size = size
+        self.buf = np.full((len(self.teams), size, len(STATS)), np.nan) if buf is None else buf
+        self.count = np.zeros(len(self.teams), dtype=np.int64) if count is None else count
+
+    def codes(self, names):
+        new = pd.Index(pd.unique(np.asarray(names, dtype=object))).difference(self.teams)
+        if len(new):
+            self.teams = self.teams.append(new)
+            self.buf = np.concatenate([self.buf, np.full((len(new), self.size, len(STATS)), np.nan)])
+            self.count = np.r_[self.count, np.zeros(len(new), dtype=np.int64)]
+        return self.teams.get_indexer(names)
+
+    def features(self, codes):
+        """(len(codes), len(FEATURES)) rolling means of the last w appearances (NaN-skipping)."""
+        out = []
+        for w in FORM_WINDOWS:
+            back = np.arange(w)
+            slot = (self.count[codes, None] - 1 - back) % self.size
+            vals = self.buf[codes[:, None], slot]                        # (n, w, stats)
+            ok = (back < self.count[codes, None])[:, :, None] & ~np.isnan(vals)
+            with np.errstate(invalid="ignore"):
+                out.append(np.where(ok, vals, 0.0).sum(axis=1) / ok.sum(axis=1))
+        return np.concatenate(out, axis=1)
+
+    def push(self, codes, values):
+        """Append one appearance per code (codes must be distinct)."""
+        self.buf[codes, self.count[codes] % self.size] = values
+        self.count[codes] += 1
+
+    def replay(self, long):
+        """Pre-match features for every appearance in `long` (in order), updating the buffer.
+
+        Appearances are processed in batches of one match day; a team playing twice on a day
+        is split into a second batch so it sees its first result.
+        """
+        codes = self.codes(long["team"].to_numpy(object))
+        values = long[list(STATS)].to_numpy(float)
+        nth = long.groupby(["day","team"]).cumcount().to_numpy()
+        order = np.lexsort((nth, long["day"].to_numpy()))  # stable: match order within a batch
+        key = long["day"].to_numpy()[order].astype("int64") * 8 + nth[order]
+        starts = np.r_[0, np.flatnonzero(key[1:] != key[:-1]) + 1, len(key)]
+        out = np.empty((len(long), len(FEATURES)))
+        for lo, hi in zip(starts[:-1], starts[1:]):
+            idx = order[lo:hi]
+            out[idx] = self.features(codes[idx])
+            self.push(codes[idx], values[idx])
+        return out
+
+    def current(self, df):
+        """As-of-now FORM_COLS for fixtures in `df` (NaN for teams never seen)."""
+        return np.hstack([self.features(self.codes(df[f"{side}_team"].astype(object).to_numpy()))
+                          for side in ("home","away")])
+
+    def save(self, path, meta, prematch):
+        """Buffer plus the features of every processed match, in one uncompressed npz."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, teams=self.teams.to_numpy(dtype=str), buf=self.buf, count=self.count,
+                     match_id=prematch["match_id"].to_numpy(dtype=str), features=prematch[FORM_COLS].to_numpy(float),
+                     meta=np.array(json.dumps(meta)))
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        """Returns (state, meta, prematch)."""
+        with np.load(path, allow_pickle=False) as z:
+            prematch = pd.DataFrame(z["features"], columns=FORM_COLS)
+            prematch.insert(0, "match_id", z["match_id"].astype(object))
+            return cls(z["teams"].astype(object), z["buf"], z["count"]), json.loads(str(z["meta"])), prematch
+
+# ---------- full recompute (verification path) ----------
+def recompute(res):
+    """Same features with a groupby/shift/rolling pass over the whole history."""
+    long = appearances(res)
+    g = long.groupby("team", sort=False)
+    feats = {}
+    for w in FORM_WINDOWS:
+        for s in STATS:
+            feats[f"form_{s}_{w}"] = g[s].transform(lambda x: x.shift().rolling(w, min_periods=1).mean())
+    return _wide(res, long, pd.DataFrame(feats)[FEATURES].to_numpy())
+
+def _wide(res, long, feats):
+    """Appearance-level features -> one row per match: match_id + FORM_COLS."""
+    out = pd.DataFrame({"match_id": res["match_id"].to_numpy()})
+    for side in ("home","away"):
+        m = (long["side"] == side).to_numpy()
+        block = np.full((len(res), len(FEATURES)), np.nan)
+        block[long["row"].to_numpy()[m]] = feats[m]
+        out[[f"{side}_{f}" for f in FEATURES]] = block
+    return out
+
+# ---------- incremental update ----------
+def update(hist):
+    """Bring the checkpoint up to date with `hist`; returns (state, per-match features)."""
+    res = results(hist)
+    settings = {"windows": list(FORM_WINDOWS)}
+    state, prematch, new = None, None, None
+    if os.path.exists(STATE_PATH):
+        state, meta, prematch = FormState.load(STATE_PATH)
+        done = res[res["date"] <= pd.Timestamp(meta["last_date"])]
+        if meta["settings"] == settings and frame_hash(done) == meta["prefix_hash"]:
+            new = res.iloc[len(done):].reset_index(drop=True)
+    mode = "incremental" if new is not None else "full replay"
+    if new is None:
+        state, new, prematch = FormState(), res, None
+    if len(new) or mode != "incremental":
+        long = appearances(new)
+        fresh = _wide(new, long, state.replay(long))
+        prematch = pd.concat([prematch, fresh], ignore_index=True) if prematch is not None and len(prematch) else fresh
+        last = res["date"].max() if len(res) else pd.Timestamp.min
+        state.save(STATE_PATH, {"settings": settings, "last_date": str(last), "prefix_hash": frame_hash(res)}, prematch)
+    print(f"[OK] form {mode}: {len(new)} new results, {len(state.teams)} teams")
+    return state, prematch
+
+def add_form(hist, upc):
+    """Return (hist, upc) with FORM_COLS: pre-match form for played matches, current form otherwise."""
+    hist, upc = hist.reset_index(drop=True), upc.reset_index(drop=True)
+    state, prematch = update(hist)
+    ids = match_ids(hist["date"], hist["home_team"], hist["away_team"])
+    played = ids.isin(prematch["match_id"]).to_numpy()[:, None]
+    pre = prematch.set_index("match_id").reindex(ids)[FORM_COLS].to_numpy()
+    hist[FORM_COLS] = np.where(played, pre, state.current(hist))
+    upc[FORM_COLS] = state.current(upc)
+    return hist, upc
+
+def verify(hist):
+    """Compare the checkpointed features with a full recompute; returns the max abs difference."""
+    _, prematch = update(hist)
+    full = recompute(results(hist)).set_index("match_id")
+    got = prematch.set_index("match_id").reindex(full.index)[FORM_COLS]
+    diff = np.nanmax(np.abs(got.to_numpy() - full[FORM_COLS].to_numpy()), initial=0.0)
+    mismatched_nan = (got.isna().to_numpy() != full[FORM_COLS].isna().to_numpy()).sum()
+    print(f"[{'OK' if diff < 1e-9 and not mismatched_nan else 'WARN'}] verify: max |diff| = {diff:.2e}, "
+          f"{mismatched_nan} NaN mismatches over {len(full)} matches")
+    return diff
+
+def main():
+    ap = argparse.ArgumentParser(description="Rolling team form for HIST and UPCOMING.")
+    ap.add_argument("--verify", action="store_true", help="check the incremental state against a full recompute")
+    args = ap.parse_args()
+    hist = schema.read(HIST_PATH) if os.path.exists(HIST_PATH) else pd.DataFrame(columns=INPUT_COLS)
+    upc = schema.read(UPCOMING_PATH) if os.path.exists(UPCOMING_PATH) else pd.DataFrame(columns=INPUT_COLS[:3])
+    if args.verify:
+        verify(hist); return
+    hist, upc = add_form(hist, upc)
+    hist.to_csv(HIST_PATH, index=False)
+    upc.to_csv(UPCOMING_PATH, index=False)
+    print(f"[OK] form -> {HIST_PATH} ({len(hist)}) | {UPCOMING_PATH} ({len(upc)})")
+
+if __name__ == "__main__":
+    main()
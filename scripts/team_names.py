@@ -0,0 +1,122 @@
+# scripts/team_names.py
+# Canonical team names. Every source spells teams its own way ("Atletico Madrid" / "Atlético
+# Madrid" / "Club Atlético de Madrid", "Man Utd" / "Manchester United"), and any mismatch
+# silently breaks the merges in enrich_features.py.
+#
+# NameResolver maps a column in two steps, on its unique values only:
+#   1) exact entry in data/team_name_map.csv
+#   2) normalized key (accents folded, casefolded, punctuation and club-form affixes like FC /
+#      SSC dropped, Man / Utd expanded) against the map and the known canonical names
+# Names that still match nothing are listed in data/unresolved_team_names.csv. With
+# TEAM_NAME_FUZZY on, the closest known name (difflib, TEAM_NAME_FUZZY_CUTOFF) is suggested
+# there and appended to team_name_map.csv with a "pending" note; pending rows are ignored until
+# someone reviews them and clears the note. Suggestions never cross squads: a name with a B /
+# II / U21 / Women token only matches names with the same tokens.
+
+import os, re, difflib, unicodedata
+import numpy as np
+import pandas as pd
+
+DATA_DIR = "data"
+NAME_MAP_PATH = os.path.join(DATA_DIR, "team_name_map.csv")
+UNRESOLVED_PATH = os.path.join(DATA_DIR, "unresolved_team_names.csv")
+
+FUZZY = os.environ.get("TEAM_NAME_FUZZY", "1").strip() != "0"
+FUZZY_CUTOFF = float(os.environ.get("TEAM_NAME_FUZZY_CUTOFF", "0.88"))
+
+# letters NFKD does not decompose
+_FOLD = str.maketrans({"ø": "o", "Ø": "o", "æ": "ae", "Æ": "ae", "œ": "oe", "Œ": "oe", "ß": "ss",
+                       "đ": "d", "Đ": "d", "ł": "l", "Ł": "l", "ı": "i"})
+# club-form tokens that carry no identity
+_AFFIXES = {"fc","cf","afc","sc","ac","ssc","sl","sk","cp","fk","bk","if","kv","sv","vfb","club","calcio"}
+# tokens that name a different squad of the same club
+_SQUADS = {"b","c","ii","iii","w","women","womens","ladies","fem","femenino","feminin","reserves",
+           "youth","academy","jong"}
+PENDING = "pending"
+_ABBREV = {"man": "manchester", "utd": "united", "st": "saint", "munchen": "munich"}
+
+def name_key(name) -> str:
+    """Spelling-insensitive key: 'Atlético Madrid', 'ATLETICO MADRID CF' -> 'atletico madrid'."""
+    s = unicodedata.normalize("NFKD", str(name).translate(_FOLD))
+    s = "".join(ch for ch in s if not unicodedata.combining(ch)).casefold()
+    tokens = [_ABBREV.get(t, t) for t in re.split(r"[^0-9a-z]+", s) if t]
+    core = [t for t in tokens if t not in _AFFIXES]
+    return " ".join(core or tokens)
+
+def squad(key) -> frozenset:
+    """Squad-distinguishing tokens of a name key ('real madrid b' -> {'b'}, 'x u21' -> {'u21'})."""
+    return frozenset(t for t in key.split() if t in _SQUADS or re.fullmatch(r"u\d\d", t))
+
+class NameResolver:
+    """Resolve team-name columns to canonical names; see the module header for the steps."""
+    def __init__(self, name_map=None, known=()):
+        self.name_map = dict(name_map or {})
+        self.by_key = {}
+        for name in list(known) + list(self.name_map.values()):
+            self.by_key.setdefault(name_key(name), name)
+        for raw, canonical in self.name_map.items():
+            self.by_key.setdefault(name_key(raw), canonical)
+        self.suggested = {}   # raw -> (canonical, score) from the fuzzy step, written back as pending
+        self.unresolved = {}  # raw -> number of rows seen
+        self._memo = {}
+
+    def _resolve_one(self, raw):
+        if raw in self.name_map: return self.name_map[raw]
+        key = name_key(raw)
+        if key in self.by_key: return self.by_key[key]
+        if FUZZY:
+            tokens = squad(key)
+            match = difflib.get_close_matches(key, [k for k in self.by_key if squad(k) == tokens],
+                                              n=1, cutoff=FUZZY_CUTOFF)
+            if match:  # a suggestion only: the name stays unresolved until the map entry is approved
+                score = difflib.SequenceMatcher(None, key, match[0]).ratio()
+                self.suggested[raw] = (self.by_key[match[0]], round(score, 3))
+        return None
+
+    def resolve(self, series: pd.Series, report=True) -> pd.Series:
+        """Canonical names for `series`; each distinct value is resolved once and broadcast back."""
+        if isinstance(series.dtype, pd.CategoricalDtype):  # already factorized
+            codes, uniques = series.cat.codes.to_numpy(), series.cat.categories.astype(str).str.strip()
+        else:
+            codes, uniques = pd.factorize(series.astype("string").str.strip())
+        out = np.empty(len(uniques), dtype=object)
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        for i, raw in enumerate(uniques):
+            if raw not in self._memo:
+                self._memo[raw] = self._resolve_one(raw)
+            out[i] = self._memo[raw] if self._memo[raw] is not None else raw
+            if self._memo[raw] is None and report and counts[i]:
+                self.unresolved[raw] = self.unresolved.get(raw, 0) + int(counts[i])
+        resolved = pd.Series(np.append(out, None)[codes], index=series.index, dtype=object)
+        return resolved.where(series.notna(), series)
+
+    def save(self, path=NAME_MAP_PATH):
+        """Append new fuzzy suggestions to the map file with note 'pending fuzzy <score>'."""
+        old = pd.read_csv(path) if os.path.exists(path) else pd.DataFrame(columns=["raw","canonical"])
+        seen = set(old["raw"].astype(str).str.strip())
+        new = pd.DataFrame([(raw, c, f"{PENDING} fuzzy {s}") for raw, (c, s) in self.suggested.items()
+                            if raw not in seen], columns=["raw","canonical","note"])
+        if new.empty: return 0
+        pd.concat([old, new], ignore_index=True).to_csv(path, index=False)
+        print(f"[INFO] {len(new)} fuzzy team-name suggestions added to {path}; "
+              f"clear their '{PENDING}' note to apply them")
+        return len(new)
+
+    def report(self, path=UNRESOLVED_PATH):
+        """Write the names nothing matched (most frequent first) with any fuzzy suggestion;
+        returns how many there are."""
+        rep = pd.DataFrame([(n, k, self.suggested.get(n, (None,))[0])
+                            for n, k in sorted(self.unresolved.items(), key=lambda kv: (-kv[1], kv[0]))],
+                           columns=["name","rows","suggestion"])
+        rep.to_csv(path, index=False)
+        if len(rep):
+            print(f"[WARN] {len(rep)} team names matched no known team -> {path}")
+        return len(rep)
+
+def load_name_map(path=NAME_MAP_PATH):
+    """raw -> canonical from the map file, leaving out rows whose note is still pending."""
+    if not os.path.exists(path): return {}
+    m = pd.read_csv(path).dropna(subset=["raw","canonical"])
+    if "note" in m.columns:
+        m = m[~m["note"].astype("string").str.strip().str.startswith(PENDING).fillna(False)]
+    return dict(zip(m["raw"].astype(str).str.strip(), m["canonical"].astype(str).str.strip()))
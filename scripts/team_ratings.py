@@ -0,0 +1,147 @@
+# scripts/team_ratings.py
+# Elo ratings from the results in HIST_matches.csv; adds pre-match ratings to HIST and UPCOMING:
+#   home_elo, away_elo   ratings going into the match
+#   elo_exp_home         expected home score (win = 1, draw = 0.5) including home advantage
+#
+# Update (World Football Elo style): delta = K * G(goal diff) * (result - expected), added to the
+# home side and subtracted from the away side. Matches are replayed in date order, one array
+# update per match day (ratings within a day use the start-of-day values).
+#
+# Per-team state is checkpointed in data/.cache/elo_state.json. A run only replays matches
+# newer than the checkpoint, unless the settings or any already-processed result changed
+# (then everything is replayed, which takes well under a second).
+
+import os, json
+import numpy as np
+import pandas as pd
+from utils import frame_hash, match_ids
+import schema
+
+HIST_PATH = "data/HIST_matches.csv"
+UPCOMING_PATH = "data/UPCOMING_fixtures.csv"
+STATE_PATH = os.path.join("data", ".cache", "elo_state.json")
+PREMATCH_PATH = os.path.join("data", ".cache", "elo_prematch.csv")
+
+SETTINGS = {
+    "base": float(os.environ.get("ELO_BASE", "1500")),
+    "k": float(os.environ.get("ELO_K", "20")),
+    "home": float(os.environ.get("ELO_HOME", "60")),  # home advantage, rating points
+}
+RESULT_COLS = ["date","home_team","away_team","home_goals","away_goals"]
+RATING_COLS = ["home_elo","away_elo","elo_exp_home"]
+
+def expected_home(r_home, r_away, home=None):
+    home = SETTINGS["home"] if home is None else home
+    return 1.0 / (1.0 + 10.0 ** ((r_away - r_home - home) / 400.0))
+
+def goal_multiplier(gd):
+    gd = np.abs(gd)
+    return np.where(gd <= 1, 1.0, np.where(gd == 2, 1.5, (11.0 + gd) / 8.0))
+
+def replay(matches, teams, ratings):
+    """Replay date-sorted `matches` from `ratings` (aligned with the `teams` Index).
+
+    Returns (pre-match home ratings, pre-match away ratings, teams, ratings after the last
+    match). Each match day is one vectorized update; np.add.at handles a team appearing
+    twice on the same day.
+    """
+    seen = pd.Index(pd.unique(pd.concat([matches["home_team"], matches["away_team"]])), dtype=object)
+    teams = seen if teams.empty else teams.append(seen.difference(teams))  # existing order kept: ratings align
+    ratings = np.r_[ratings, np.full(len(teams) - len(ratings), SETTINGS["base"])]
+    h = teams.get_indexer(matches["home_team"])
+    a = teams.get_indexer(matches["away_team"])
+    gh, ga = matches["home_goals"].to_numpy(dtype=float), matches["away_goals"].to_numpy(dtype=float)
+    score = np.where(gh > ga, 1.0, np.where(gh == ga, 0.5, 0.0))
+    weight = SETTINGS["k"] * goal_multiplier(gh - ga)
+    days = matches["date"].to_numpy(dtype="datetime64[D]")
+    pre_h, pre_a = np.empty(len(matches)), np.empty(len(matches))
+    starts = np.r_[0, np.flatnonzero(days[1:] != days[:-1]) + 1, len(matches)]
+    for lo, hi in zip(starts[:-1], starts[1:]):
+        hh, aa = h[lo:hi], a[lo:hi]
+        rh, ra = ratings[hh], ratings[aa]
+        pre_h[lo:hi], pre_a[lo:hi] = rh, ra
+        delta = weight[lo:hi] * (score[lo:hi] - expected_home(rh, ra))
+        np.add.at(ratings, hh, delta)
+        np.add.at(ratings, aa, -delta)
+    return pre_h, pre_a, teams, ratings
+
+def settled(hist):
+    """Results only, in replay order, with a match_id."""
+    df = hist.reindex(columns=RESULT_COLS).copy()
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    for c in ("home_goals","away_goals"): df[c] = pd.to_numeric(df[c], errors="coerce")
+    df = df.dropna().sort_values(["date","home_team","away_team"], kind="stable").reset_index(drop=True)
+    df.insert(0, "match_id", match_ids(df["date"], df["home_team"], df["away_team"]))
+    return df.drop_duplicates("match_id", keep="last").reset_index(drop=True)
+
+def load_state():
+    if not (os.path.exists(STATE_PATH) and os.path.exists(PREMATCH_PATH)):
+        return None, None
+    with open(STATE_PATH) as f: state = json.load(f)
+    return state, pd.read_csv(PREMATCH_PATH, float_precision="round_trip")
+
+def save_state(state, prematch):
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    prematch.to_csv(PREMATCH_PATH + ".tmp", index=False)
+    os.replace(PREMATCH_PATH + ".tmp", PREMATCH_PATH)
+    with open(STATE_PATH + ".tmp", "w") as f: json.dump(state, f)
+    os.replace(STATE_PATH + ".tmp", STATE_PATH)
+
+def update(hist):
+    """Bring the checkpoint up to date with `hist`; returns (teams, ratings, pre-match table)."""
+    results = settled(hist)
+    state, prematch = load_state()
+    new, mode = None, "incremental"
+    if state is not None and state["settings"] == SETTINGS:
+        done = results[results["date"] <= pd.Timestamp(state["last_date"])]
+        if frame_hash(done) == state["prefix_hash"]:  # nothing already replayed has changed
+            new = results.iloc[len(done):]
+            teams, ratings = pd.Index(state["teams"], dtype=object), np.array(state["ratings"], dtype=float)
+    if new is None:
+        new, teams, ratings, prematch, mode = results, pd.Index([], dtype=object), np.empty(0), None, "full replay"
+    if len(new):
+        pre_h, pre_a, teams, ratings = replay(new, teams, ratings)
+        fresh = pd.DataFrame({"match_id": new["match_id"].to_numpy(), "home_elo": pre_h, "away_elo": pre_a})
+        prematch = pd.concat([prematch, fresh], ignore_index=True) if prematch is not None and len(prematch) else fresh
+    if prematch is None:
+        prematch = pd.DataFrame(columns=["match_id","home_elo","away_elo"])
+    last = results["date"].max() if len(results) else pd.Timestamp.min
+    save_state({"settings": SETTINGS, "last_date": str(last), "prefix_hash": frame_hash(results),
+                "teams": list(teams), "ratings": ratings.tolist()}, prematch)
+    print(f"[OK] Elo {mode}: {len(new)} new results, {len(teams)} teams")
+    return teams, ratings, prematch
+
+def current(df, teams, ratings):
+    """Latest ratings for fixtures that have not been played (unknown teams start at the base)."""
+    out = []
+    for side in ("home","away"):
+        code = teams.get_indexer(df[f"{side}_team"])
+        out.append(np.where(code >= 0, np.r_[ratings, SETTINGS["base"]][code], SETTINGS["base"]))
+    return out
+
+def add_ratings(hist, upc):
+    """Return (hist, upc) with RATING_COLS (re)computed."""
+    hist, upc = hist.reset_index(drop=True), upc.reset_index(drop=True)  # new frames, columns keep their place
+    teams, ratings, prematch = update(hist)
+
+    # played matches get their pre-match ratings, anything unplayed the current ones
+    ids = match_ids(hist["date"], hist["home_team"], hist["away_team"])
+    pre = prematch.set_index("match_id").reindex(ids)
+    cur_h, cur_a = current(hist, teams, ratings)
+    hist["home_elo"] = pre["home_elo"].fillna(pd.Series(cur_h, index=pre.index)).to_numpy()
+    hist["away_elo"] = pre["away_elo"].fillna(pd.Series(cur_a, index=pre.index)).to_numpy()
+    upc["home_elo"], upc["away_elo"] = current(upc, teams, ratings)
+    for df in (hist, upc):
+        df["elo_exp_home"] = expected_home(df["home_elo"], df["away_elo"])
+    return hist, upc
+
+def main():
+    hist = schema.read(HIST_PATH) if os.path.exists(HIST_PATH) else pd.DataFrame(columns=RESULT_COLS)
+    upc = schema.read(UPCOMING_PATH) if os.path.exists(UPCOMING_PATH) else pd.DataFrame(columns=RESULT_COLS[:3])
+    hist, upc = add_ratings(hist, upc)
+    hist.to_csv(HIST_PATH, index=False)
+    upc.to_csv(UPCOMING_PATH, index=False)
+    print(f"[OK] ratings -> {HIST_PATH} ({len(hist)}) | {UPCOMING_PATH} ({len(upc)})")
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,230 @@
+import io, os, csv, json, time, hashlib, threading
 import pandas as pd
 import requests
-from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-def download_csv(url: str) -> pd.DataFrame:
-    r = requests.get(url, timeout=60)
-    r.raise_for_status()
-    return pd.read_csv(StringIO(r.text))
+# Concurrency knobs for bulk downloads (HTTP_MAX_WORKERS=1 gives the old serial behaviour)
+HTTP_MAX_WORKERS = int(os.environ.get("HTTP_MAX_WORKERS", "8"))
+HTTP_PER_HOST = int(os.environ.get("HTTP_PER_HOST", "4"))
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.environ.get("HTTP_BACKOFF", "0.5"))
+
+# Persistent response cache (HTTP_CACHE=0 disables it)
+HTTP_CACHE = os.environ.get("HTTP_CACHE", "1").strip() != "0"
+HTTP_CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", os.path.join("data", ".cache", "http"))
+
+CACHE_STATS = {"frozen_hits": 0, "revalidated": 0, "unchanged": 0, "misses": 0,
+               "bytes_saved": 0, "bytes_downloaded": 0}
+_stats_lock = threading.Lock()
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """One pooled session per process; GETs are retried with exponential backoff."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(total=HTTP_RETRIES, backoff_factor=HTTP_BACKOFF,
+                          status_forcelist=(429, 500, 502, 503, 504),
+                          allowed_methods=("GET", "HEAD"), respect_retry_after_header=True)
+            adapter = HTTPAdapter(pool_connections=HTTP_MAX_WORKERS, pool_maxsize=HTTP_MAX_WORKERS,
+                                  max_retries=retry)
+            s = requests.Session()
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _session = s
+    return _session
+
+def _count(**kw):
+    with _stats_lock:
+        for k, v in kw.items(): CACHE_STATS[k] += v
+
+def cache_summary() -> str:
+    s = dict(CACHE_STATS)
+    return (f"http cache: {s['frozen_hits']} frozen, {s['revalidated']} not modified, "
+            f"{s['unchanged']} unchanged, {s['misses']} downloaded | "
+            f"{s['bytes_saved']/1e6:.1f} MB saved, {s['bytes_downloaded']/1e6:.1f} MB fetched")
+
+def _cache_paths(url):
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(HTTP_CACHE_DIR, key + ".body"), os.path.join(HTTP_CACHE_DIR, key + ".json")
+
+def fetch_cached(url: str, session: requests.Session = None, frozen: bool = False):
+    """Download `url` into the on-disk cache and return (body_path, meta).
+
+    A cached `frozen` entry is returned without touching the network (finished seasons).
+    Otherwise the stored ETag / Last-Modified are sent as If-None-Match / If-Modified-Since
+    and a 304 reuses the cached body. meta["changed"] is False whenever the body on disk
+    has the same sha256 as before.
+    """
+    body_path, meta_path = _cache_paths(url)
+    meta = {}
+    if os.path.exists(meta_path) and os.path.exists(body_path):
+        with open(meta_path) as f: meta = json.load(f)
+    if meta and frozen:
+        _count(frozen_hits=1, bytes_saved=meta.get("size", 0))
+        return body_path, dict(meta, changed=False)
+
+    headers = {}
+    if meta.get("etag"): headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"): headers["If-Modified-Since"] = meta["last_modified"]
+    with (session or get_session()).get(url, headers=headers, timeout=60, stream=True) as r:
+        if r.status_code == 304 and meta:
+            _count(revalidated=1, bytes_saved=meta.get("size", 0))
+            return body_path, dict(meta, changed=False)
+        r.raise_for_status()
+        os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+        h, size, tmp = hashlib.sha256(), 0, f"{body_path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as out:
+            for chunk in r.iter_content(chunk_size=1 << 16):
+                h.update(chunk); size += len(chunk); out.write(chunk)
+        os.replace(tmp, body_path)
+        new = {"url": url, "etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified"),
+               "sha256": h.hexdigest(), "size": size, "fetched_at": time.time()}
+    changed = new["sha256"] != meta.get("sha256")
+    _count(misses=1, bytes_downloaded=size, unchanged=0 if changed else 1)
+    with open(meta_path + ".tmp", "w") as f: json.dump(new, f)
+    os.replace(meta_path + ".tmp", meta_path)
+    return body_path, dict(new, changed=changed)
+
+def sniff_encoding(head: bytes) -> str:
+    """Pick a codec from the first bytes of a file: BOMs first, then UTF-8, else Windows-1252."""
+    if head.startswith(b"\xef\xbb\xbf"): return "utf-8-sig"
+    if head.startswith((b"\xff\xfe", b"\xfe\xff")): return "utf-16"
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # a multi-byte sequence cut off at the end of the sample is still UTF-8
+        if e.start < len(head) - 3: return "cp1252"
+    return "utf-8"
+
+def csv_header(path: str) -> list:
+    """Column names from the first line of a CSV file only ([] for an empty file)."""
+    with open(path, "rb") as f: line = f.readline()
+    return next(csv.reader([line.decode(sniff_encoding(line), errors="replace").rstrip("\r\n")]), [])
+
+def download_csv(url: str, session: requests.Session = None, frozen: bool = False,
+                 usecols=None, dtype=None) -> pd.DataFrame:
+    """Parse a remote CSV without materialising the decoded text.
+
+    The body is parsed straight from the cached file (or, with HTTP_CACHE=0, from the
+    response stream); `usecols`/`dtype` are handed to read_csv so unused columns are
+    never converted.
+    """
+    kw = dict(usecols=usecols, dtype=dtype, encoding_errors="replace")
+    if HTTP_CACHE:
+        path, _ = fetch_cached(url, session=session, frozen=frozen)
+        with open(path, "rb") as f:
+            encoding = sniff_encoding(f.read(1 << 16))
+            f.seek(0)
+            return pd.read_csv(f, encoding=encoding, **kw)
+    with (session or get_session()).get(url, timeout=60, stream=True) as r:
+        r.raise_for_status()
+        r.raw.decode_content = True
+        r.raw.auto_close = False  # let the io wrapper see EOF instead of a closed file
+        stream = io.BufferedReader(r.raw, buffer_size=1 << 16)
+        df = pd.read_csv(stream, encoding=sniff_encoding(stream.peek(1 << 16)), **kw)
+        _count(misses=1, bytes_downloaded=r.raw.tell())
+    return df
+
+def download_many(urls, fetch=download_csv, max_workers=None, per_host=None):
+    """Fetch `urls` on a bounded thread pool and yield (url, result, error) in input order.
+
+    Results are yielded as soon as the next URL in order has finished, so callers can
+    process early files while later downloads are still in flight. At most `per_host`
+    requests hit the same host at once.
+    """
+    urls = list(urls)
+    max_workers = max(1, min(max_workers or HTTP_MAX_WORKERS, len(urls) or 1))
+    per_host = max(1, per_host or HTTP_PER_HOST)
+    slots = {host: threading.BoundedSemaphore(per_host) for host in {urlsplit(u).netloc for u in urls}}
+
+    def task(u):
+        with slots[urlsplit(u).netloc]:
+            return fetch(u)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="download") as pool:
+        futures = [pool.submit(task, u) for u in urls]
+        for u, fut in zip(urls, futures):
+            try:
+                yield u, fut.result(), None
+            except Exception as e:
+                yield u, None, e
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per `per` seconds, bursting up to `capacity`.
+
+    acquire() sleeps only as long as needed for the next token, so a client can use its
+    allowance exactly instead of padding every call with a fixed sleep.
+    """
+    def __init__(self, rate: float = 1.0, per: float = 1.0, capacity: float = 1.0):
+        self.fill_rate = rate / per
+        self.capacity = capacity
+        self.tokens = capacity
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.fill_rate)
+            self.stamp = now
+            wait = (1.0 - self.tokens) / self.fill_rate if self.tokens < 1.0 else 0.0
+            if wait > 0:
+                time.sleep(wait)
+                self.stamp = time.monotonic()
+                self.tokens = 1.0
+            self.tokens -= 1.0
+
+def cached_json(cache_dir: str, key, fetch, ttl=None):
+    """Return fetch() through an on-disk JSON cache, plus whether it was a cache hit.
+
+    `key` is any JSON-serialisable value; `ttl` is in seconds (None = keep forever,
+    0 = always refetch). Results of None are not cached. Entries remember the ttl they were
+    fetched under, and ttl=None is only served from an entry fetched with ttl=None: a response
+    cached while it could still change (e.g. a season in progress) is fetched once more when
+    it becomes final, and kept from then on.
+    """
+    name = hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    path = os.path.join(cache_dir, name + ".json")
+    if ttl != 0 and os.path.exists(path):
+        with open(path) as f: entry = json.load(f)
+        final = "ttl" in entry and entry["ttl"] is None
+        if final or (ttl is not None and time.time() - entry["fetched_at"] < ttl):
+            return entry["data"], True
+    data = fetch()
+    if data is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"key": key, "fetched_at": time.time(), "ttl": ttl, "data": data}, f)
+        os.replace(path + ".tmp", path)
+    return data, False
+
+def row_hashes(df: pd.DataFrame) -> pd.Series:
+    """Stable 64-bit content hash per row, as 16-char hex strings.
+
+    Numeric columns are hashed as float64 so a column flipping int <-> float (e.g. when a
+    NaN appears elsewhere in it) does not change the hash of every other row.
+    """
+    num = df.select_dtypes("number").columns.union(df.select_dtypes("bool").columns)
+    df = df.astype({c: "float64" for c in num})
+    return pd.util.hash_pandas_object(df, index=False).map("{:016x}".format)
+
+def frame_hash(df: pd.DataFrame) -> str:
+    """Order-sensitive content hash of a whole frame (columns included)."""
+    h = hashlib.sha1("|".join(map(str, df.columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()[:16]
+
+def match_ids(date, home, away) -> pd.Series:
+    """Fixture fingerprint: hash of kick-off day plus (canonical) home and away team."""
+    day = pd.to_datetime(date, errors="coerce").dt.strftime("%Y-%m-%d")
+    key = pd.DataFrame({"date": day, "home": home.astype("string"), "away": away.astype("string")})
+    return row_hashes(key)
 
 def decimal_from_fractional(frac: str) -> float:
     if isinstance(frac, str) and "/" in frac:
@@ -1,39 +1,144 @@
-import os, pandas as pd
+# scripts/validate_data.py
+# Declarative checks over the pipeline's CSVs, cheapest first: header (first line only), then
+# nulls / types, value ranges and uniqueness, all as whole-column operations. Findings go to
+# data/validation_report.json with the offending row indices (0-based data rows).
+
+import os, json, time, argparse
+import numpy as np
+import pandas as pd
+import schema
+from utils import csv_header
+from remove_margin import FAIR_COLS
+from score_model import MODEL_COLS
 
 DATA_DIR = "data"
+REPORT_PATH = os.path.join(DATA_DIR, "validation_report.json")
+# stop checking a table after the first check tier that finds errors (VALIDATE_FAIL_FAST=0 runs all)
+FAIL_FAST = os.environ.get("VALIDATE_FAIL_FAST", "1").strip() != "0"
+MAX_ROWS = int(os.environ.get("VALIDATE_MAX_ROWS", "100"))  # violating row indices kept per check
+
+REQ_HIST = ["date","home_team","away_team","home_goals","away_goals","home_odds_dec","draw_odds_dec","away_odds_dec",
+            "home_rest_days","away_rest_days","home_travel_km","away_travel_km","home_injury_index","away_injury_index",
+            "home_gk_rating","away_gk_rating","home_setpiece_rating","away_setpiece_rating","ref_pen_rate","crowd_index"]
+REQ_UPC  = ["date","home_team","away_team","home_odds_dec","draw_odds_dec","away_odds_dec","home_rest_days","away_rest_days",
+            "home_travel_km","away_travel_km","home_injury_index","away_injury_index","home_gk_rating","away_gk_rating",
+            "home_setpiece_rating","away_setpiece_rating","ref_pen_rate","crowd_index"]
+
+# ---------- rules ----------
+# Per file: required columns (header), not_null, numeric (must parse as numbers), dates (must parse),
+# gt / between value ranges, unique keys. Value rules skip columns a file does not have and
+# ignore missing values (that is what not_null is for). header_only files are never fully parsed.
+SIDES = ("home","draw","away")
+ODDS = [f"{s}_odds_{k}" for s in SIDES for k in ("dec","best","open","latest","close")]
+UNIT = (["home_injury_index","away_injury_index","home_gk_rating","away_gk_rating","home_setpiece_rating",
+         "away_setpiece_rating","ref_pen_rate","crowd_index","elo_exp_home"]
+        + FAIR_COLS[:-2] + [c for c in MODEL_COLS if not c.startswith("model_lambda")])
+NONNEG = (["home_goals","away_goals","home_rest_days","away_rest_days","home_travel_km","away_travel_km",
+           "model_lambda_home","model_lambda_away"]
+          + [f"{s}_matches_{w}d" for s in ("home","away") for w in (7, 14, 30)])
+
+def fixtures(required, not_null):
+    return {"required": ["match_id"] + required, "not_null": ["match_id","home_team","away_team"] + not_null,
+            "numeric": [c for c in required if c not in ("date","home_team","away_team")],
+            "dates": ["date"], "gt": {c: 1.0 for c in ODDS}, "between": {c: (0.0, 1.0) for c in UNIT},
+            "nonneg": NONNEG, "unique": [["match_id"], ["date","home_team","away_team"]]}
+
+RULES = {
+    "HIST_matches.csv": fixtures(REQ_HIST, ["home_goals","away_goals"]),
+    "UPCOMING_fixtures.csv": fixtures(REQ_UPC, []),
+    "enriched_football_data.csv": {"required": ["match_id"] + REQ_HIST, "header_only": True},
+    "enriched_theodds_fixtures.csv": {"required": ["match_id"] + REQ_UPC, "header_only": True},
+    "xg_metrics_current.csv": {"required": ["league_id","team","xg","xga"], "header_only": True},
+    "xg_metrics_last.csv": {"required": ["league_id","team","xg","xga"], "header_only": True},
+    "xg_metrics_hybrid.csv": {"required": ["team","league_id","xg_hybrid","xga_hybrid"], "not_null": ["team"],
+                              "numeric": ["xg_hybrid","xga_hybrid","xgd90_hybrid"],
+                              "nonneg": ["xg_hybrid","xga_hybrid","mp_weighted"], "unique": [["team","league_id"]]},
+    "teams_master.csv": {"required": ["team","gk_rating","setpiece_rating","crowd_index"], "not_null": ["team"],
+                         "numeric": ["gk_rating","setpiece_rating","crowd_index"],
+                         "between": {c: (0.0, 1.0) for c in ("gk_rating","setpiece_rating","crowd_index")},
+                         "unique": [["team"]]},
+    "stadiums.csv": {"required": ["team","lat","lon"], "not_null": ["team"], "numeric": ["lat","lon"],
+                     "between": {"lat": (-90.0, 90.0), "lon": (-180.0, 180.0)}, "unique": [["team"]]},
+    "ref_baselines.csv": {"required": ["ref_name","ref_pen_rate"], "numeric": ["ref_pen_rate"],
+                          "between": {"ref_pen_rate": (0.0, 1.0)}, "unique": [["ref_name"]]},
+    "injuries.csv": {"required": ["date","team","injury_index"], "not_null": ["team"], "dates": ["date"],
+                     "numeric": ["injury_index"], "between": {"injury_index": (0.0, 1.0)}},
+    "lineups.csv": {"required": ["date","team","key_att_out","key_def_out","keeper_changed"], "not_null": ["team"],
+                    "dates": ["date"], "between": {f: (0, 1) for f in schema.LINEUP_FLAGS}},
+}
+FILES = list(RULES)
+
+# ---------- checks ----------
+def _num(s):
+    return pd.to_numeric(s, errors="coerce") if not pd.api.types.is_numeric_dtype(s) else s
 
-def head(df, n=5):
-    with pd.option_context("display.max_columns", 200, "display.width", 200):
-        print(df.head(n))
+def tiers(df, rules):
+    """Yield lists of (check, column, rule, bad-row mask), cheapest tier first."""
+    cols = [c for c in rules.get("not_null", []) if c in df.columns]
+    yield [("not_null", c, "not null", df[c].isna().to_numpy()) for c in cols]
+    out = [("numeric", c, "numeric", (_num(df[c]).isna() & df[c].notna()).to_numpy())
+           for c in rules.get("numeric", []) if c in df.columns and not pd.api.types.is_numeric_dtype(df[c])]
+    out += [("date", c, "parseable date", schema.to_dates(df[c]).isna().to_numpy())
+            for c in rules.get("dates", []) if c in df.columns]
+    yield out
+    out = [("range", c, f"> {lo}", (_num(df[c]) <= lo).to_numpy()) for c, lo in rules.get("gt", {}).items() if c in df.columns]
+    out += [("range", c, f"in [{lo}, {hi}]", ~_num(df[c]).between(lo, hi).to_numpy() & df[c].notna().to_numpy())
+            for c, (lo, hi) in rules.get("between", {}).items() if c in df.columns]
+    out += [("range", c, ">= 0", (_num(df[c]) < 0).to_numpy()) for c in rules.get("nonneg", []) if c in df.columns]
+    yield out
+    yield [("unique", "+".join(key), "unique", df.duplicated(key, keep=False).to_numpy())
+           for key in rules.get("unique", []) if set(key).issubset(df.columns)]
 
-def show(path, label):
-    if not os.path.exists(path):
-        print(f"[WARN] {label} not found: {path}"); return None
-    df = pd.read_csv(path)
-    print(f"\n==== {label} ({len(df)} rows) ====")
-    print("Columns:", list(df.columns)); head(df, 5); return df
+def check_table(name, df=None, fail_fast=FAIL_FAST):
+    """Validate one file (in-memory frame or DATA_DIR/name); returns its report entry."""
+    rules, path = RULES.get(name, {}), os.path.join(DATA_DIR, name)
+    if df is None and not os.path.exists(path):
+        return {"status": "missing", "checks": []}
+    cols = list(df.columns) if df is not None else csv_header(path)
+    missing = [c for c in rules.get("required", []) if c not in cols]
+    checks = [{"check": "required", "column": c, "rule": "present", "violations": 1, "rows": []} for c in missing]
+    entry = {"status": "failed" if missing else "ok", "columns": len(cols), "checks": checks}
+    if rules.get("header_only") or (missing and fail_fast):
+        return entry
+    df = df if df is not None else schema.read(path)
+    entry["rows"] = len(df)
+    for tier in tiers(df.reset_index(drop=True), rules):
+        for check, col, rule, bad in tier:
+            n = int(bad.sum())
+            if n:
+                checks.append({"check": check, "column": col, "rule": rule, "violations": n,
+                               "rows": np.flatnonzero(bad)[:MAX_ROWS].tolist()})
+        if checks:
+            entry["status"] = "failed"
+            if fail_fast: break
+    return entry
 
-def check_required(df, cols, label):
-    miss = [c for c in cols if c not in df.columns]
-    print(f"[{'OK' if not miss else 'WARN'}] {label} required cols: {('all present' if not miss else 'missing ' + str(miss))}")
+def validate(frames, report_path=REPORT_PATH):
+    """Check every file in RULES (file name -> DataFrame, missing entries are read from DATA_DIR)
+    and write the JSON report; returns it."""
+    tables = {}
+    for name in FILES:
+        tables[name] = e = check_table(name, frames.get(name))
+        rows = f"{e['rows']} rows" if "rows" in e else "header"
+        if e["status"] == "missing":
+            print(f"[WARN] {name} not found")
+        elif e["status"] == "ok":
+            print(f"[OK] {name} ({rows})")
+        else:
+            print(f"[WARN] {name} ({rows}): " + "; ".join(f"{c['column']} {c['rule']} x{c['violations']}" for c in e["checks"]))
+    report = {"generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+              "ok": all(e["status"] != "failed" for e in tables.values()), "tables": tables}
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    with open(report_path, "w") as f: json.dump(report, f, indent=1)
+    print(f"[{'OK' if report['ok'] else 'WARN'}] validation report -> {report_path}")
+    return report
 
 def main():
-    show(os.path.join(DATA_DIR, "raw_football_data.csv"), "raw_football_data.csv (enriched)")
-    show(os.path.join(DATA_DIR, "raw_theodds_fixtures.csv"), "raw_theodds_fixtures.csv (enriched)")
-    hist = show(os.path.join(DATA_DIR, "HIST_matches.csv"), "HIST_matches.csv")
-    upc  = show(os.path.join(DATA_DIR, "UPCOMING_fixtures.csv"), "UPCOMING_fixtures.csv")
-    show(os.path.join(DATA_DIR, "xg_metrics_current.csv"), "xg_metrics_current.csv")
-    show(os.path.join(DATA_DIR, "xg_metrics_last.csv"), "xg_metrics_last.csv")
-    show(os.path.join(DATA_DIR, "xg_metrics_hybrid.csv"), "xg_metrics_hybrid.csv")
-
-    req_hist = ["date","home_team","away_team","home_goals","away_goals","home_odds_dec","draw_odds_dec","away_odds_dec",
-                "home_rest_days","away_rest_days","home_travel_km","away_travel_km","home_injury_index","away_injury_index",
-                "home_gk_rating","away_gk_rating","home_setpiece_rating","away_setpiece_rating","ref_pen_rate","crowd_index"]
-    req_upc  = ["date","home_team","away_team","home_odds_dec","draw_odds_dec","away_odds_dec","home_rest_days","away_rest_days",
-                "home_travel_km","away_travel_km","home_injury_index","away_injury_index","home_gk_rating","away_gk_rating",
-                "home_setpiece_rating","away_setpiece_rating","ref_pen_rate","crowd_index"]
-    if hist is not None: check_required(hist, req_hist, "HIST_matches.csv")
-    if upc  is not None: check_required(upc,  req_upc,  "UPCOMING_fixtures.csv")
+    ap = argparse.ArgumentParser(description="Check the pipeline's CSVs against declarative rules.")
+    ap.add_argument("--strict", action="store_true", help="exit with status 1 when any check fails")
+    args = ap.parse_args()
+    report = validate({})
+    if args.strict and not report["ok"]: raise SystemExit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,78 @@
+# tests/test_odds_watch.py
+# fetch_the_odds_api.watch() against a local stand-in for The Odds API.
+
+import os, sys, json, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+import fetch_the_odds_api as odds
+
+def game(gid, home, away, prices):
+    return {"id": gid, "sport_key": "soccer_test", "commence_time": "2030-01-05T15:00:00Z",
+            "home_team": home, "away_team": away,
+            "bookmakers": [{"key": "book", "title": "Book", "last_update": "2030-01-01T10:00:00Z",
+                            "markets": [{"key": "h2h", "outcomes": [
+                                {"name": home, "price": prices[0]}, {"name": "Draw", "price": prices[1]},
+                                {"name": away, "price": prices[2]}]}]}]}
+
+PAYLOAD = [game("g1", "Arsenal", "Chelsea", (2.1, 3.4, 3.5)), game("g2", "Inter", "Milan", (2.5, 3.2, 2.9))]
+
+class FakeOddsApi(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = json.dumps(PAYLOAD if "/odds" in self.path else [{"key": "soccer_test"}]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("x-requests-remaining", "450")
+        self.send_header("x-requests-used", "50")
+        self.send_header("x-requests-last", "1")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOddsApi)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.chdir(tmp_path)  # odds_history writes under ./data
+    os.makedirs("data")
+    monkeypatch.setattr(odds, "BASE", f"http://127.0.0.1:{server.server_address[1]}/v4")
+    monkeypatch.setattr(odds, "API_KEY", "test")
+    monkeypatch.setattr(odds, "SPORT", "soccer_test")
+    monkeypatch.setattr(odds, "OUT_UPCOMING", os.path.join("data", "raw_theodds_fixtures.csv"))
+    monkeypatch.setattr(odds, "QUOTA", {"remaining": None, "used": None, "last": None})
+    yield
+    server.shutdown()
+
+def test_watch_writes_once_then_sees_no_changes(api, capsys):
+    odds.watch(max_polls=2, sleep=lambda s: None)
+    out = capsys.readouterr().out
+    assert out.count("fixtures changed") == 1
+    assert "2 fixtures changed" in out
+    assert out.index("fixtures changed") < out.index("No price changes")
+    assert len(pd.read_csv(odds.OUT_UPCOMING)) == 2
+
+def test_watch_refreshes_odds_lines(api, capsys):
+    odds.watch(max_polls=1, sleep=lambda s: None)
+    lines = pd.read_csv(odds.odds_history.OUT_LINES)
+    assert lines["home_odds_latest"].tolist() == [2.1, 2.5]
+    PAYLOAD[0]["bookmakers"][0]["markets"][0]["outcomes"][0]["price"] = 2.0
+    try:
+        odds.watch(max_polls=1, sleep=lambda s: None)
+    finally:
+        PAYLOAD[0]["bookmakers"][0]["markets"][0]["outcomes"][0]["price"] = 2.1
+    lines = pd.read_csv(odds.odds_history.OUT_LINES)
+    assert lines["home_odds_open"].tolist() == [2.1, 2.5]
+    assert lines["home_odds_latest"].tolist() == [2.0, 2.5]
+
+def test_watch_matches_a_snapshot_with_utc_dates(api, capsys):
+    # a file written straight from the feed keeps its "...Z" kick-off strings
+    odds.write_snapshot(odds.normalize_odds(PAYLOAD))
+    odds.watch(max_polls=2, sleep=lambda s: None)
+    out = capsys.readouterr().out
+    assert "fixtures changed" not in out
+    assert out.count("No price changes") == 2
+    assert len(pd.read_csv(odds.OUT_UPCOMING)) == 2